@@ -0,0 +1,173 @@
+import os
+import queue
+import re
+import threading
+
+import numpy as np
+from gym_gazebo.utils.atomic_write import atomic_write
+
+
+def snapshotWeights(model):
+    """
+    Returns a private copy of the model's weights as a list of NumPy arrays.
+    """
+    return [np.array(weights, copy=True) for weights in model.get_weights()]
+
+
+def saveWeights(path, weights):
+    """
+    Writes a list of weight arrays to an .npz file, atomically replacing `path`.
+    """
+    with atomic_write(path, binary=True, fsync=True) as f:
+        np.savez(f, *weights)
+
+
+def loadWeights(path):
+    with np.load(path) as data:
+        return [data['arr_{}'.format(i)] for i in range(len(data.files))]
+
+
+class WeightWriter:
+    """
+    Writes weight snapshots to .npz files from a background thread.
+
+    At most `maxPending` snapshots wait to be written; beyond that write() blocks
+    until one is on disk, which bounds the memory they hold. A write error is
+    raised by the next write(), wait() or close() call.
+    """
+    def __init__(self, maxPending=2):
+        self._pending = queue.Queue(maxPending)
+        self.error = None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, path, weights, callback=None):
+        """
+        Queues `weights` (e.g. from snapshotWeights) to be saved to `path`; the writer
+        thread calls `callback` once they are on disk.
+        """
+        self._raiseError()
+        self._pending.put((path, weights, callback))
+
+    def wait(self):
+        """
+        Blocks until every queued snapshot is on disk.
+        """
+        self._pending.join()
+        self._raiseError()
+
+    def close(self):
+        self._pending.put(None)
+        self._thread.join()
+        self._raiseError()
+
+    def _raiseError(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            try:
+                if item is None:
+                    return
+                path, weights, callback = item
+                saveWeights(path, weights)
+                if callback is not None:
+                    callback()
+            except Exception as e:
+                self.error = e
+            finally:
+                self._pending.task_done()
+
+
+class CheckpointManager:
+    """
+    Saves DeepQ weights without stalling the training loop.
+
+    save() only copies the weights into NumPy arrays; a background thread then
+    writes them to `directory` as <prefix>-<step>.npz, through a temporary file
+    renamed into place so a crash never leaves a truncated checkpoint. Only the
+    newest `keep` checkpoints are kept on disk. Checkpoints hold weights only and
+    are restored into an already built network with restore().
+
+    At most `maxPending` snapshots wait for the writer; beyond that save() blocks
+    until one is written, which bounds the memory held by pending snapshots.
+    A write error is raised by the next save(), wait() or close() call.
+
+        checkpoints = CheckpointManager('/tmp/cartpole_checkpoints', keep=3)
+        checkpoints.restore(deepQ.model)  # resumes from the newest one, if any
+        ...
+        if episode % 100 == 0:
+            checkpoints.save(deepQ.model, episode)
+        ...
+        checkpoints.close()
+    """
+    def __init__(self, directory, keep=5, prefix='checkpoint', maxPending=2):
+        """
+        Parameters:
+            - directory: folder holding the checkpoints, created if needed
+            - keep: number of most recent checkpoints kept on disk
+            - prefix: file name prefix of the checkpoints
+            - maxPending: snapshots that may wait for the writer before save() blocks
+        """
+        if keep < 1:
+            raise ValueError("keep must be at least 1, not {}".format(keep))
+        self.directory = directory
+        self.keep = keep
+        self.prefix = prefix
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._pattern = re.compile(r'^{}-(\d+)\.npz$'.format(re.escape(prefix)))
+        self._writer = WeightWriter(maxPending)
+
+    def path(self, step):
+        return os.path.join(self.directory, '{}-{:08d}.npz'.format(self.prefix, step))
+
+    def checkpoints(self):
+        """
+        Returns the (step, path) of every checkpoint on disk, oldest first.
+        """
+        found = []
+        for name in os.listdir(self.directory):
+            match = self._pattern.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def latest(self):
+        checkpoints = self.checkpoints()
+        return checkpoints[-1][1] if checkpoints else None
+
+    def save(self, model, step):
+        """
+        Snapshots the model's weights and queues them to be written as checkpoint `step`.
+        """
+        self._writer.write(self.path(step), snapshotWeights(model), self._prune)
+
+    def restore(self, model, path=None):
+        """
+        Loads the weights of checkpoint `path` (by default the newest one) into `model`.
+        Returns the path loaded, or None if there is no checkpoint to restore.
+        """
+        if path is None:
+            path = self.latest()
+            if path is None:
+                return None
+        model.set_weights(loadWeights(path))
+        return path
+
+    def wait(self):
+        """
+        Blocks until every queued snapshot is on disk.
+        """
+        self._writer.wait()
+
+    def close(self):
+        self._writer.close()
+
+    def _prune(self):
+        for step, path in self.checkpoints()[:-self.keep]:
+            os.remove(path)
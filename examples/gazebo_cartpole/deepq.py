@@ -6,6 +6,8 @@ from keras.layers import Dense, Activation, LeakyReLU, Dropout
 from keras.models import load_model
 from keras.regularizers import l2
 
+import checkpoint
+import inference
 import memory
 
 
@@ -20,7 +22,9 @@ class DeepQ:
             target = reward(s,a) + gamma * max(Q(s')
 
     """
-    def __init__(self, inputs, outputs, memorySize, discountFactor, learningRate, learnStart):
+    def __init__(self, inputs, outputs, memorySize, discountFactor, learningRate, learnStart,
+                 prioritized=False, priorityAlpha=0.6, priorityBeta=0.4, memoryDirectory=None,
+                 frameHistory=None):
         """
         Parameters:
             - inputs: input size
@@ -29,21 +33,62 @@ class DeepQ:
             - discountFactor: the discount factor (gamma)
             - learningRate: learning rate
             - learnStart: steps to happen before for learning. Set to 128
+            - prioritized: use prioritized experience replay instead of uniform sampling
+            - priorityAlpha: how strongly TD errors shape the sampling (0 is uniform)
+            - priorityBeta: initial importance-sampling exponent, annealed to 1
+            - memoryDirectory: keep the replay memory in memory-mapped files in this
+              directory, resuming from whatever it already holds
+            - frameHistory: learn from uint8 camera frames, stored once in a
+              memory.FrameMemory and stacked frameHistory deep; inputs is then
+              frameHistory * height * width and pixels are scaled to [0, 1]
         """
         self.input_size = inputs
         self.output_size = outputs
-        self.memory = memory.Memory(memorySize)
+        if prioritized and memoryDirectory is not None:
+            raise ValueError("Prioritized replay cannot be combined with a disk-backed memory")
+        if frameHistory is not None and (prioritized or memoryDirectory is not None):
+            raise ValueError("Frame replay cannot be combined with prioritized or disk-backed memories")
+        if frameHistory is not None:
+            self.memory = memory.FrameMemory(memorySize, frameHistory)
+        elif prioritized:
+            self.memory = memory.PrioritizedMemory(memorySize, alpha=priorityAlpha, beta=priorityBeta)
+        elif memoryDirectory is not None:
+            self.memory = memory.MemmapMemory(memorySize, memoryDirectory)
+        else:
+            self.memory = memory.Memory(memorySize)
         self.discountFactor = discountFactor
         self.learnStart = learnStart
         self.learningRate = learningRate
+        self.inputScale = 1.0 / 255 if frameHistory is not None else 1.0
+        self.actorModel = None
+        self._weightWriter = None  # checkpoint.WeightWriter for .npz saves, started on first use
 
-    def initNetworks(self, hiddenLayers):
+    def initNetworks(self, hiddenLayers, actorNetwork=False):
+        """
+        Parameters:
+            - hiddenLayers: sizes of the hidden layers
+            - actorNetwork: select actions with a NumPy snapshot of the model that only
+              changes through publishWeights and target updates (see exportInference),
+              for use with a background learner.Learner
+        """
         model = self.createModel(self.input_size, self.output_size, hiddenLayers, "relu", self.learningRate)
         self.model = model
 
         targetModel = self.createModel(self.input_size, self.output_size, hiddenLayers, "relu", self.learningRate)
         self.targetModel = targetModel
 
+        if actorNetwork:
+            self.exportInference()
+
+    def exportInference(self):
+        """
+        Snapshots the model's Dense weights into a NumPy-only network used by getQValues,
+        so action selection costs a few matmuls instead of a Keras predict call.
+        The snapshot is refreshed by publishWeights, and by updateTargetNetwork unless
+        publish=False.
+        """
+        self.actorModel = inference.NumpyMLP(self.model)
+
     def createRegularizedModel(self, inputs, outputs, hiddenLayers, activationType, learningRate):
         bias = True
         dropout = 0
@@ -118,27 +163,40 @@ class DeepQ:
 
 
     def backupNetwork(self, model, backup):
-        weightMatrix = []
-        for layer in model.layers:
-            weights = layer.get_weights()
-            weightMatrix.append(weights)
-        i = 0
-        for layer in backup.layers:
-            weights = weightMatrix[i]
-            layer.set_weights(weights)
-            i += 1
+        backup.set_weights(model.get_weights())
 
-    def updateTargetNetwork(self):
+    def updateTargetNetwork(self, publish=True):
+        """
+        Copies the online network into the target network. With publish, the actor
+        network (if any) gets the same weights; a Learner passes publish=False and
+        hands them to the actor through its own versioned publish instead.
+        """
         self.backupNetwork(self.model, self.targetModel)
+        if publish and self.actorModel is not None:
+            self.publishWeights(self.model.get_weights())
+
+    def publishWeights(self, weights):
+        """
+        Loads a list of weight arrays (as returned by model.get_weights()) into the
+        NumPy network used for action selection.
+        """
+        self.actorModel.set_weights(weights)
+
+    def networkInputs(self, states):
+        """
+        Flattens a batch of states (vectors or frame stacks) into network inputs.
+        """
+        states = np.asarray(states)
+        return states.reshape(len(states), -1) * self.inputScale
 
     # predict Q values for all the actions
     def getQValues(self, state):
-        predicted = self.model.predict(state.reshape(1,len(state)))
+        model = self.model if self.actorModel is None else self.actorModel
+        predicted = model.predict(self.networkInputs(np.asarray(state)[None]))
         return predicted[0]
 
     def getTargetQValues(self, state):
-        #predicted = self.targetModel.predict(state.reshape(1,len(state)))
-        predicted = self.targetModel.predict(state.reshape(1,len(state)))
+        predicted = self.targetModel.predict(self.networkInputs(np.asarray(state)[None]))
 
         return predicted[0]
 
@@ -168,70 +226,112 @@ class DeepQ:
         return action
 
     def selectActionByProbability(self, qValues, bias):
-        qValueSum = 0
-        shiftBy = 0
-        for value in qValues:
-            if value + shiftBy < 0:
-                shiftBy = - (value + shiftBy)
-        shiftBy += 1e-06
-
-        for value in qValues:
-            qValueSum += (value + shiftBy) ** bias
-
-        probabilitySum = 0
-        qValueProbabilities = []
-        for value in qValues:
-            probability = ((value + shiftBy) ** bias) / float(qValueSum)
-            qValueProbabilities.append(probability + probabilitySum)
-            probabilitySum += probability
-        qValueProbabilities[len(qValueProbabilities) - 1] = 1
+        """
+        Samples actions with probability proportional to (Q(s,a) + shift) ** bias, where
+        shift lifts the smallest Q-value of each row to just above zero.
 
-        rand = random.random()
-        i = 0
-        for value in qValueProbabilities:
-            if (rand <= value):
-                return i
-            i += 1
+        qValues is either one (n_actions,) vector, for which a single action is returned,
+        or a (batch, n_actions) array from a vectorized env loop, for which an array of
+        actions is returned. Sampling uses the Gumbel-max trick on the log-probabilities,
+        so neither large nor negative Q-values nor a large bias can overflow.
+        """
+        qValues = np.asarray(qValues, dtype=np.float64)
+        single = qValues.ndim == 1
+        qValues = np.atleast_2d(qValues)
+        shiftBy = np.maximum(0.0, -qValues.min(axis=1, keepdims=True)) + 1e-06
+        logProbabilities = bias * np.log(qValues + shiftBy)
+        actions = np.argmax(logProbabilities + np.random.gumbel(size=qValues.shape), axis=1)
+        return int(actions[0]) if single else actions
 
     def addMemory(self, state, action, reward, newState, isFinal):
         self.memory.addMemory(state, action, reward, newState, isFinal)
 
     def learnOnLastState(self):
         if self.memory.getCurrentSize() >= 1:
-            return self.memory.getMemory(self.memory.getCurrentSize() - 1)
+            return self.memory.getMemory(self.memory.lastIndex())
+
+    def calculateTargets(self, qValuesNewStates, rewards, finals):
+        """
+        Batched calculateTarget: reward for final transitions,
+        reward + gamma * max(Q(s')) otherwise.
+        """
+        notFinal = ~np.asarray(finals, dtype=bool)
+        return rewards + self.discountFactor * np.max(qValuesNewStates, axis=1) * notFinal
+
+    def buildTrainingBatch(self, states, actions, rewards, newStates, finals, useTargetNetwork=True):
+        """
+        Builds the (X, Y) training arrays for a batch of transitions with one
+        forward pass over the states and one over the new states, and returns
+        them with the TD error of every transition.
+        Final transitions also teach Q(s', .) = reward, as the per-sample loop did.
+        """
+        states = self.networkInputs(np.asarray(states, dtype=np.float64))
+        newStates = self.networkInputs(np.asarray(newStates, dtype=np.float64))
+        finals = np.asarray(finals, dtype=bool)
+
+        qValues = self.model.predict(states, batch_size=len(states))
+        nextModel = self.targetModel if useTargetNetwork else self.model
+        qValuesNewStates = nextModel.predict(newStates, batch_size=len(newStates))
+
+        Y_batch = np.array(qValues, dtype=np.float64)
+        rows = np.arange(len(actions))
+        targets = self.calculateTargets(qValuesNewStates, rewards, finals)
+        tdErrors = targets - Y_batch[rows, actions]
+        Y_batch[rows, actions] = targets
+
+        finalRewards = np.asarray(rewards, dtype=np.float64)[finals]
+        X_batch = np.concatenate((states, newStates[finals]))
+        Y_batch = np.concatenate((Y_batch, np.repeat(finalRewards[:, None], self.output_size, axis=1)))
+        return X_batch, Y_batch, tdErrors
+
+    def trainOnBatch(self, batch, weights=None, useTargetNetwork=True):
+        """
+        Runs one gradient step on a sampled batch and returns its TD errors.
+        """
+        X_batch, Y_batch, tdErrors = self.buildTrainingBatch(*batch, useTargetNetwork=useTargetNetwork)
+        if weights is None:
+            self.model.train_on_batch(X_batch, Y_batch)
+        else:
+            # the extra rows of final transitions share their transition's weight
+            finals = batch[4]
+            sampleWeights = np.concatenate((weights, weights[finals]))
+            self.model.train_on_batch(X_batch, Y_batch, sample_weight=sampleWeights)
+        return tdErrors
 
     def learnOnMiniBatch(self, miniBatchSize, useTargetNetwork=True):
         # Do not learn until we've got self.learnStart samples
         if self.memory.getCurrentSize() > self.learnStart:
             # learn in batches of 128
-            miniBatch = self.memory.getMiniBatch(miniBatchSize)
-            X_batch = np.empty((0,self.input_size), dtype = np.float64)
-            Y_batch = np.empty((0,self.output_size), dtype = np.float64)
-            for sample in miniBatch:
-                isFinal = sample['isFinal']
-                state = sample['state']
-                action = sample['action']
-                reward = sample['reward']
-                newState = sample['newState']
-
-                qValues = self.getQValues(state)
-                if useTargetNetwork:
-                    qValuesNewState = self.getTargetQValues(newState)
-                else :
-                    qValuesNewState = self.getQValues(newState)
-                targetValue = self.calculateTarget(qValuesNewState, reward, isFinal)
-
-                X_batch = np.append(X_batch, np.array([state.copy()]), axis=0)
-                Y_sample = qValues.copy()
-                Y_sample[action] = targetValue
-                Y_batch = np.append(Y_batch, np.array([Y_sample]), axis=0)
-                if isFinal:
-                    X_batch = np.append(X_batch, np.array([newState.copy()]), axis=0)
-                    Y_batch = np.append(Y_batch, np.array([[reward]*self.output_size]), axis=0)
-            self.model.fit(X_batch, Y_batch, batch_size = len(miniBatch), epochs=1, verbose = 0)
+            batch, indices, weights = self.memory.sampleWeighted(miniBatchSize)
+            tdErrors = self.trainOnBatch(batch, weights, useTargetNetwork)
+            self.memory.updatePriorities(indices, tdErrors)
 
     def saveModel(self, path):
-        self.model.save(path)
+        """
+        Saves the network to `path`. An .npz path saves the weights only: they are
+        snapshotted here and written by a background thread, so the training loop
+        does not wait for the disk (waitForSaves blocks until they are written).
+        Any other path gets a full Keras model with its optimizer state. model.save
+        reads the live variables, so it stays synchronous: running it next to
+        training would save weights from different steps.
+        """
+        if path.endswith('.npz'):
+            if self._weightWriter is None:
+                self._weightWriter = checkpoint.WeightWriter()
+            self._weightWriter.write(path, checkpoint.snapshotWeights(self.model))
+        else:
+            self.model.save(path)
+
+    def waitForSaves(self):
+        """
+        Blocks until every .npz save queued by saveModel is on disk.
+        """
+        if self._weightWriter is not None:
+            self._weightWriter.wait()
 
     def loadWeights(self, path):
-        self.model.set_weights(load_model(path).get_weights())
\ No newline at end of file
+        # .npz files are weight-only checkpoints written by checkpoint.CheckpointManager
+        if path.endswith('.npz'):
+            self.model.set_weights(checkpoint.loadWeights(path))
+        else:
+            self.model.set_weights(load_model(path).get_weights())
\ No newline at end of file
@@ -0,0 +1,104 @@
+import bisect
+import math
+
+import numpy as np
+
+
+class Discretizer:
+    """
+    Maps continuous observations to dense integer state ids.
+
+    Every observation dimension has its own increasing array of bin edges.
+    A value v falls into bin i when edges[i-1] <= v < edges[i], so a dimension
+    with k edges has k + 1 bins (the two outer bins are open ended). The
+    per-dimension bins are combined row-major into a single id in
+    [0, numStates), which is a cheap dict key and can index a
+    (numStates, numActions) array directly.
+    """
+    def __init__(self, binEdges):
+        """
+        Parameters:
+            - binEdges: one increasing sequence of edges per observation dimension.
+                        An empty sequence puts the whole dimension in a single bin.
+        """
+        self.binEdges = []
+        for edges in binEdges:
+            edges = np.asarray(edges, dtype=np.float64).reshape(-1)
+            if np.any(np.diff(edges) <= 0):
+                raise ValueError("Bin edges must be strictly increasing: {}".format(edges))
+            self.binEdges.append(edges)
+        # plain lists are faster than arrays for the single observation path
+        self._edgeLists = [edges.tolist() for edges in self.binEdges]
+
+        self.shape = tuple(len(edges) + 1 for edges in self.binEdges)
+        self.numStates = int(np.prod(self.shape))
+        strides = np.ones(len(self.shape), dtype=np.int64)
+        for i in range(len(self.shape) - 2, -1, -1):
+            strides[i] = strides[i + 1] * self.shape[i + 1]
+        self.strides = strides
+        self._strideList = strides.tolist()
+
+    def encode(self, observation):
+        """
+        Returns the integer state id of a single observation.
+        """
+        stateId = 0
+        for value, edges, stride in zip(observation, self._edgeLists, self._strideList):
+            stateId += bisect.bisect_right(edges, value) * stride
+        return stateId
+
+    def encodeBatch(self, observations):
+        """
+        Returns an int64 array with the state id of every row of observations.
+        """
+        observations = np.asarray(observations, dtype=np.float64).reshape(-1, len(self.shape))
+        stateIds = np.zeros(len(observations), dtype=np.int64)
+        for dim, edges in enumerate(self.binEdges):
+            stateIds += np.searchsorted(edges, observations[:, dim], side='right') * self.strides[dim]
+        return stateIds
+
+    def decode(self, stateIds):
+        """
+        Returns the per-dimension bin indices of stateIds, as a tuple with one
+        entry (or array, for array input) per dimension.
+        """
+        stateIds = np.asarray(stateIds, dtype=np.int64)
+        if np.any((stateIds < 0) | (stateIds >= self.numStates)):
+            raise ValueError("State ids must lie in [0, {})".format(self.numStates))
+        return np.unravel_index(stateIds, self.shape)
+
+    def decodeValues(self, stateIds):
+        """
+        Returns a representative observation for every state id: the centre of
+        each bounded bin, and the inner edge of the open ended outer bins.
+        The result has shape (len(stateIds), dims), or (dims,) for a scalar id.
+        """
+        bins = self.decode(stateIds)
+        values = np.empty(np.shape(stateIds) + (len(self.shape),), dtype=np.float64)
+        for dim, edges in enumerate(self.binEdges):
+            values[..., dim] = self._binCentres(edges)[bins[dim]]
+        return values
+
+    @staticmethod
+    def _binCentres(edges):
+        if len(edges) == 0:
+            return np.zeros(1)
+        inner = (edges[:-1] + edges[1:]) / 2.0
+        return np.concatenate(([edges[0]], inner, [edges[-1]]))
+
+
+def cartPoleDiscretizer(thetaBins=20, thetaDotBins=8, thetaDotLimit=4.0):
+    """
+    Discretizer for GazeboCartPolev0Env observations [x, x_dot, theta, theta_dot].
+
+    The environment currently zeroes x and x_dot, so they get a single bin each.
+    theta is split evenly over the termination range of the environment
+    (12 degrees either side) and theta_dot over [-thetaDotLimit, thetaDotLimit].
+    """
+    thetaThreshold = 12 * 2 * math.pi / 360
+    return Discretizer([
+        [],
+        [],
+        np.linspace(-thetaThreshold, thetaThreshold, thetaBins + 1),
+        np.linspace(-thetaDotLimit, thetaDotLimit, thetaDotBins + 1),
+    ])
@@ -1,14 +1,14 @@
 #!/usr/bin/env python3
 import gym
-from gym import wrappers
+from gym_gazebo import wrappers
 import gym_gazebo
 import time
-import numpy
 import random
 import time
 
 import qlearn
 import liveplot
+import discretizer
 
 import os.path
 from os import path
@@ -37,17 +37,18 @@ if __name__ == '__main__':
     env = gym.make('GazeboCartPole-v0')
 
     outdir = '/tmp/gazebo_gym_experiments'
-    env = gym.wrappers.Monitor(env, outdir, force=True)
+    env = wrappers.Monitor(env, outdir, force=True, flush_every_episodes=10)
     plotter = liveplot.LivePlot(outdir)
 
-    last_time_steps = numpy.ndarray(0)
-
     # Setup qlearning
     qlearn = qlearn.QLearn(actions=range(env.action_space.n),
                            alpha=0.2, gamma=0.8, epsilon=0)
 
     initial_epsilon = qlearn.epsilon
 
+    # Map observations to dense integer state ids instead of string keys
+    state_discretizer = discretizer.cartPoleDiscretizer()
+
     epsilon_discount = 0.999956
 
     # Load parameters, move file before running if not wanted
@@ -82,7 +83,7 @@ if __name__ == '__main__':
 
         # render() #defined above, not env.render()
 
-        state = ''.join(map(str, observation))
+        state = state_discretizer.encode(observation)
         qlearn.num_times_learn = 0
         qlearn.num_times_seen_before = 0
 
@@ -101,7 +102,7 @@ if __name__ == '__main__':
             if highest_reward < cumulated_reward:
                 highest_reward = cumulated_reward
 
-            nextState = ''.join(map(str, observation))
+            nextState = state_discretizer.encode(observation)
 
             qlearn.learn(state, action, reward, nextState)
             angle = observation[2]
@@ -116,12 +117,9 @@ if __name__ == '__main__':
                 reward1 = 1
             #print("Angle: {}\nAngular: {}\nReward for forward: {}.\nReward for backward: {}\n******".format(angle, angular_v, reward1, reward0))
 
-            env._flush(force=True)
-
             if not(done):
                 state = nextState
             else:
-                last_time_steps = numpy.append(last_time_steps, [int(i + 1)])
                 break
         print("Amount of state action pairs seen before: {}/{}".format(qlearn.num_times_seen_before, qlearn.num_times_learn))
 
@@ -138,11 +136,12 @@ if __name__ == '__main__':
     #Github table content
     print ("\n|"+str(total_episodes)+"|"+str(qlearn.alpha)+"|"+str(qlearn.gamma)+"|"+str(initial_epsilon)+"*"+str(epsilon_discount)+"|"+str(highest_reward)+"| PICTURE |")
 
-    l = last_time_steps.tolist()
-    l.sort()
+    length_stats = env.get_length_stats()
 
     #print("Parameters: a="+str)
-    print("Overall score: {:0.2f}".format(last_time_steps.mean()))
-    print("Best 100 score: {:0.2f}".format(reduce(lambda x, y: x + y, l[-100:]) / len(l[-100:])))
+    print("Overall score: {:0.2f}".format(length_stats.mean))
+    print("Best 100 score: {:0.2f}".format(length_stats.best_mean()))
 
+    plotter.plot(env)
+    plotter.close()
     env.close()
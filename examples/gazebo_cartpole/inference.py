@@ -0,0 +1,88 @@
+import numpy as np
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+def _linear(x):
+    return x
+
+def _tanh(x):
+    return np.tanh(x, out=x)
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def _leakyReLU(alpha):
+    def leakyReLU(x):
+        return np.where(x > 0, x, alpha * x)
+    return leakyReLU
+
+activations = {
+    'relu': _relu,
+    'linear': _linear,
+    'tanh': _tanh,
+    'sigmoid': _sigmoid,
+}
+
+
+class NumpyMLP:
+    """
+    Evaluates a Keras Sequential MLP (Dense, Activation, LeakyReLU and Dropout layers)
+    with plain NumPy matmuls, avoiding the per-call framework overhead of model.predict
+    on single states.
+
+    The layer structure is read once from the model; set_weights then takes the flat
+    list returned by model.get_weights(), so the snapshot can be refreshed cheaply
+    from weights published by another thread. Each refresh swaps in a new list of
+    layers in one assignment, so a concurrent predict sees either the old or the new
+    weights, never a mix.
+    """
+    def __init__(self, model):
+        self._ops = []  # per layer: ('dense', activation, hasBias) or ('activation', function)
+        for layer in model.layers:
+            kind = type(layer).__name__
+            if kind == 'Dense':
+                self._ops.append(('dense', self._activation(layer.activation), getattr(layer, 'use_bias', True)))
+            elif kind == 'Activation':
+                self._ops.append(('activation', self._activation(layer.activation)))
+            elif kind == 'LeakyReLU':
+                alpha = getattr(layer, 'alpha', getattr(layer, 'negative_slope', 0.3))
+                self._ops.append(('activation', _leakyReLU(float(alpha))))
+            elif kind == 'Dropout':
+                continue
+            else:
+                raise ValueError('NumpyMLP cannot evaluate {} layers'.format(kind))
+        self.layers = []
+        self.set_weights(model.get_weights())
+
+    @staticmethod
+    def _activation(function):
+        name = getattr(function, '__name__', str(function))
+        if name not in activations:
+            raise ValueError('NumpyMLP does not support the {} activation'.format(name))
+        return activations[name]
+
+    def set_weights(self, weights):
+        weights = iter(weights)
+        layers = []
+        for op in self._ops:
+            if op[0] == 'dense':
+                kernel = np.array(next(weights))
+                bias = np.array(next(weights)) if op[2] else np.zeros(kernel.shape[1], dtype=kernel.dtype)
+                layers.append((kernel, bias, op[1]))
+            else:
+                layers.append((None, None, op[1]))
+        self.layers = layers
+
+    def predict(self, x):
+        """
+        Returns the network output for a (batch, inputs) array, like model.predict.
+        """
+        x = np.asarray(x, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            if kernel is not None:
+                x = np.dot(x, kernel)
+                x += bias
+            x = activation(x)
+        return x
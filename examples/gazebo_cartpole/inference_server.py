@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class _Request:
+    def __init__(self, state):
+        self.state = state
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class InferenceServer(threading.Thread):
+    """
+    Answers getQValues requests from many actor threads with batched forward passes.
+
+    Actors call getQValues(state) exactly as they would on a DeepQ; the call blocks
+    until the server has evaluated it. The server takes the first pending request,
+    keeps collecting more until it has maxBatchSize of them or maxLatency seconds
+    have passed since the first one arrived, then runs a single model.predict over
+    the stacked states and hands each caller its row. Several Gazebo workers thus
+    share one network and amortize its evaluation.
+
+    `model` is anything with a predict((batch, inputs)) method: a Keras model, or the
+    inference.NumpyMLP snapshot from DeepQ.exportInference, which can keep receiving
+    weights through DeepQ.publishWeights while the server runs.
+    """
+    def __init__(self, model, maxBatchSize=32, maxLatency=0.002):
+        """
+        Parameters:
+            - model: network with a batched predict method
+            - maxBatchSize: most requests answered by one forward pass
+            - maxLatency: seconds the first request of a batch may wait for others
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.model = model
+        self.maxBatchSize = maxBatchSize
+        self.maxLatency = maxLatency
+        self.requests = queue.Queue()
+        self._stopRequest = object()
+        # Held while checking `stopped` and queueing, so no request can slip in behind the stop request
+        self._lock = threading.Lock()
+        self.stopped = False
+        self.batches = 0
+        self.served = 0
+
+    def getQValues(self, state):
+        request = _Request(np.asarray(state))
+        with self._lock:
+            if self.stopped:
+                raise RuntimeError("InferenceServer is stopped")
+            self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def meanBatchSize(self):
+        return self.served / float(self.batches) if self.batches else 0.0
+
+    def run(self):
+        try:
+            self._serve()
+        finally:
+            self._failPending()
+
+    def _serve(self):
+        while True:
+            first = self.requests.get()
+            if first is self._stopRequest:
+                return
+            batch = [first]
+            stopping = False
+            deadline = time.time() + self.maxLatency
+            while len(batch) < self.maxBatchSize:
+                remaining = deadline - time.time()
+                try:
+                    request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is self._stopRequest:
+                    stopping = True
+                    break
+                batch.append(request)
+
+            self._evaluate(batch)
+            if stopping:
+                return
+
+    def _evaluate(self, batch):
+        try:
+            qValues = self.model.predict(np.stack([request.state for request in batch]))
+        except Exception as e:
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+        self.batches += 1
+        self.served += len(batch)
+        for request, row in zip(batch, qValues):
+            request.result = row
+            request.done.set()
+
+    def _failPending(self):
+        """
+        Fails every request still queued, so none of their callers waits forever.
+        """
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                return
+            if request is not self._stopRequest:
+                request.error = RuntimeError("InferenceServer stopped before answering the request")
+                request.done.set()
+
+    def stop(self, timeout=None):
+        """
+        Stops the server thread. Requests queued before the call are still answered;
+        later getQValues calls raise RuntimeError.
+        """
+        with self._lock:
+            if not self.stopped:
+                self.stopped = True
+                self.requests.put(self._stopRequest)
+        if self.is_alive():
+            self.join(timeout)
+        elif self.ident is None:
+            # Never started: nobody else will answer the queued requests
+            self._failPending()
@@ -0,0 +1,147 @@
+import threading
+import time
+
+
+class RateCounter:
+    """
+    Thread-safe event counter that reports the average rate since the previous rate() call.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self._lastCount = 0
+        self._lastTime = time.time()
+
+    def increment(self, n=1):
+        with self.lock:
+            self.count += n
+
+    def rate(self):
+        with self.lock:
+            now = time.time()
+            elapsed = now - self._lastTime
+            rate = (self.count - self._lastCount) / elapsed if elapsed > 0 else 0.0
+            self._lastCount = self.count
+            self._lastTime = now
+            return rate
+
+
+class Learner(threading.Thread):
+    """
+    Trains a DeepQ on a background thread while the actor keeps stepping the environment.
+
+    The actor pushes transitions with addMemory (instead of DeepQ.addMemory), and
+    calls syncActor between steps to load the most recently published weights into
+    the actor network; the learner publishes a copy of its weights every
+    `publishEvery` gradient steps. The replay memory is shared, so every access to
+    it goes through `lock`. Env steps/sec and gradient steps/sec are counted
+    independently and read with rates().
+
+    Actor loop:
+        deepQ.initNetworks(hiddenLayers, actorNetwork=True)
+        learner = Learner(deepQ, miniBatchSize=128)
+        learner.start()
+        while training:
+            action = deepQ.selectAction(deepQ.getQValues(state), explorationRate)
+            newState, reward, done, info = env.step(action)
+            learner.addMemory(state, action, reward, newState, done)
+            learner.syncActor()
+        learner.stop()
+    """
+    def __init__(self, deepQ, miniBatchSize, publishEvery=100, updateTargetEvery=10000,
+                 useTargetNetwork=True, idleSleep=0.01):
+        """
+        Parameters:
+            - deepQ: DeepQ whose networks were created with actorNetwork=True
+            - miniBatchSize: transitions per gradient step
+            - publishEvery: gradient steps between weight publishes to the actor
+            - updateTargetEvery: gradient steps between target network updates
+            - useTargetNetwork: bootstrap from the target network
+            - idleSleep: seconds to wait while the memory holds fewer than learnStart transitions
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.deepQ = deepQ
+        self.miniBatchSize = miniBatchSize
+        self.publishEvery = publishEvery
+        self.updateTargetEvery = updateTargetEvery
+        self.useTargetNetwork = useTargetNetwork
+        self.idleSleep = idleSleep
+
+        self.lock = threading.Lock()
+        self.envSteps = RateCounter()
+        self.gradientSteps = RateCounter()
+        self._stopEvent = threading.Event()
+        self._published = None
+        self.publishedVersion = 0
+        self.actorVersion = 0
+        self.error = None
+
+    def addMemory(self, state, action, reward, newState, isFinal):
+        with self.lock:
+            self.deepQ.addMemory(state, action, reward, newState, isFinal)
+        self.envSteps.increment()
+
+    def syncActor(self):
+        """
+        Loads the latest published weights into the actor network. Returns True if
+        new weights were loaded. Call it from the actor thread.
+        """
+        if self.error is not None:
+            raise self.error
+        if self.actorVersion == self.publishedVersion:
+            return False
+        with self.lock:
+            weights, version = self._published, self.publishedVersion
+        self.deepQ.publishWeights(weights)
+        self.actorVersion = version
+        return True
+
+    def rates(self):
+        """
+        Returns (env steps/sec, gradient steps/sec) since the previous call.
+        """
+        return self.envSteps.rate(), self.gradientSteps.rate()
+
+    def run(self):
+        try:
+            self._learn()
+        except Exception as e:
+            # surfaced to the actor on its next syncActor call
+            self.error = e
+
+    def _learn(self):
+        deepQ = self.deepQ
+        steps = 0
+        while not self._stopEvent.is_set():
+            with self.lock:
+                ready = deepQ.memory.getCurrentSize() > deepQ.learnStart
+                if ready:
+                    batch, indices, weights = deepQ.memory.sampleWeighted(self.miniBatchSize)
+            if not ready:
+                self._stopEvent.wait(self.idleSleep)
+                continue
+
+            tdErrors = deepQ.trainOnBatch(batch, weights, self.useTargetNetwork)
+            with self.lock:
+                deepQ.memory.updatePriorities(indices, tdErrors)
+            steps += 1
+            self.gradientSteps.increment()
+
+            targetUpdate = steps % self.updateTargetEvery == 0
+            if targetUpdate:
+                # The actor only ever loads weights through syncActor, so an
+                # older unsynced publish can't roll it back past this update
+                deepQ.updateTargetNetwork(publish=False)
+            if targetUpdate or steps % self.publishEvery == 0:
+                self._publish()
+
+    def _publish(self):
+        published = self.deepQ.model.get_weights()
+        with self.lock:
+            self._published = published
+            self.publishedVersion += 1
+
+    def stop(self, timeout=None):
+        self._stopEvent.set()
+        self.join(timeout)
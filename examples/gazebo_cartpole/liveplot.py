@@ -1,38 +1,147 @@
 #!/usr/bin/env python3
+import os
+import time
+
 import matplotlib
-import matplotlib.pyplot as plt
-import gym
+import matplotlib.style
+from gym_gazebo.utils.decimation import DecimatedSeries
 
 rewards_key = 'episode_rewards'
 
+
 class LivePlot(object):
-    def __init__(self, outdir, data_key=rewards_key, line_color='blue'):
+    def __init__(self, outdir, data_key=rewards_key, line_color='blue', maxPoints=2000,
+                 headless=False, filename='liveplot.png', saveInterval=5.0):
         """
         Liveplot renders a graph of either episode_rewards or episode_lengths
         Args:
             outdir (outdir): Monitor output file location used to populate the graph
             data_key (Optional[str]): The key in the json to graph (episode_rewards or episode_lengths).
             line_color (Optional[dict]): Color of the plot.
+            maxPoints (Optional[int]): Most points drawn; longer histories are averaged into
+                buckets, drawn with their min/max envelope.
+            headless (Optional[bool]): Draw off-screen and save the graph as a PNG in outdir
+                instead of opening a window.
+            filename (Optional[str]): Name of the PNG written in headless mode.
+            saveInterval (Optional[float]): Least seconds between two PNG writes in headless mode.
         """
         self.outdir = outdir
         self.data_key = data_key
         self.line_color = line_color
+        self.headless = headless
+        self.path = os.path.join(outdir, filename)
+        self.saveInterval = saveInterval
+        self._lastSave = None
+        self._unsaved = False
+        self.series = DecimatedSeries(maxPoints)
 
         #styling options
         matplotlib.rcParams['toolbar'] = 'None'
-        plt.style.use('ggplot')
-        plt.xlabel("Episodes")
-        plt.ylabel(data_key)
-        fig = plt.gcf().canvas.set_window_title('simulation_graph')
+        matplotlib.style.use('ggplot')
+        if headless:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            self.fig = Figure()
+            FigureCanvasAgg(self.fig)
+        else:
+            import matplotlib.pyplot as plt
+            self.fig = plt.figure()
+            manager = getattr(self.fig.canvas, 'manager', None)
+            if manager is not None:
+                manager.set_window_title('simulation_graph')
+            plt.show(block=False)
+        self.ax = self.fig.add_subplot(1, 1, 1)
+        self.ax.set_xlabel("Episodes")
+        self.ax.set_ylabel(data_key)
+
+        # One artist per series, updated in place on every plot call. With blitting they
+        # are left out of full redraws and drawn over a cached background instead.
+        self.blit = not headless and getattr(self.fig.canvas, 'supports_blit', False)
+        self.line, = self.ax.plot([], [], color=line_color, animated=self.blit)
+        self.lowLine, = self.ax.plot([], [], color=line_color, alpha=0.3, linewidth=0.5, animated=self.blit)
+        self.highLine, = self.ax.plot([], [], color=line_color, alpha=0.3, linewidth=0.5, animated=self.blit)
+        self._background = None
+        self._drawn = False
+        if self.blit:
+            # A resized window invalidates the cached background
+            self.fig.canvas.mpl_connect('resize_event', self._clearBackground)
 
     def plot(self, env):
         if self.data_key is rewards_key:
-            data = gym.wrappers.Monitor.get_episode_rewards(env)
+            data = env.get_episode_rewards()
         else:
-            data = gym.wrappers.Monitor.get_episode_lengths(env)
+            data = env.get_episode_lengths()
 
-        plt.plot(data, color=self.line_color)
+        # Only the episodes completed since the previous call are read
+        self.series.extend(data[self.series.count:])
+        x, means, mins, maxs = self.series.points()
+        self.line.set_data(x, means)
+        envelope = self.series.bucket_size > 1
+        self.lowLine.set_data(x if envelope else [], mins if envelope else [])
+        self.highLine.set_data(x if envelope else [], maxs if envelope else [])
+        rescaled = self._updateLimits(x, mins, maxs)
+
+        if self.headless:
+            self._save()
+        elif self.blit:
+            self._blit(rescaled)
+        else:
+            self.fig.canvas.draw_idle()
+            self.fig.canvas.flush_events()
+
+    def _updateLimits(self, x, mins, maxs):
+        """
+        Grows the axes limits, with headroom, when the data leaves them.
+        Returns True if they changed, which requires a full redraw.
+        """
+        if not len(x):
+            return False
+        (_, x1), (y0, y1) = self.ax.get_xlim(), self.ax.get_ylim()
+        low, high = mins.min(), maxs.max()
+        rescaled = False
+        if not self._drawn or x[-1] > x1:
+            self.ax.set_xlim(0, max(10, 2 * x[-1]))
+            rescaled = True
+        if not self._drawn or low < y0 or high > y1:
+            margin = max(1.0, 0.1 * (high - low))
+            self.ax.set_ylim(low - margin, high + margin)
+            rescaled = True
+        self._drawn = True
+        return rescaled
+
+    def _clearBackground(self, event=None):
+        self._background = None
+
+    def _blit(self, rescaled):
+        canvas = self.fig.canvas
+        if rescaled or self._background is None:
+            # Full redraw of the axes, ticks and grid, without the animated lines
+            canvas.draw()
+            self._background = canvas.copy_from_bbox(self.ax.bbox)
+        canvas.restore_region(self._background)
+        for line in (self.lowLine, self.highLine, self.line):
+            self.ax.draw_artist(line)
+        canvas.blit(self.ax.bbox)
+        canvas.flush_events()
+
+    def _save(self):
+        self._unsaved = True
+        if self._lastSave is not None and time.time() - self._lastSave < self.saveInterval:
+            return
+        self.flush()
+
+    def flush(self):
+        """
+        Writes the PNG now if the graph changed since the last write (headless mode only).
+        Call it, or close, after the last plot so the PNG shows the final episodes.
+        """
+        if self.headless and self._unsaved:
+            self.fig.savefig(self.path)
+            self._lastSave = time.time()
+            self._unsaved = False
 
-        # pause so matplotlib will display
-        # may want to figure out matplotlib animation or use a different library in the future
-        plt.pause(0.000001)
+    def close(self):
+        self.flush()
+        if not self.headless:
+            import matplotlib.pyplot as plt
+            plt.close(self.fig)
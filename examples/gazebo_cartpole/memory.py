@@ -1,49 +1,371 @@
-import random
+import json
+import os
+
 import numpy as np
+from gym_gazebo.utils.atomic_write import atomic_write
 
 class Memory:
     """
-    This class provides an abstraction to store the [s, a, r, a'] elements of each iteration.
-    Instead of using tuples (as other implementations do), the information is stored in lists 
-    that get returned as another list of dictionaries with each key corresponding to either 
-    "state", "action", "reward", "nextState" or "isFinal".
+    This class provides an abstraction to store the [s, a, r, s'] elements of each iteration.
+    The transitions are kept in preallocated contiguous NumPy arrays used as a ring buffer:
+    once `size` transitions are stored, every new one overwrites the oldest. The arrays are
+    allocated on the first addMemory call, when the shape of the states is known; states are
+    stored as `dtype` whatever the type of the first one, so an integer initial observation
+    cannot truncate the float states that follow it.
+    sample returns a tuple of stacked arrays gathered with a single fancy index per field.
     """
-    def __init__(self, size):
+    def __init__(self, size, seed=None, dtype=np.float32):
         self.size = size
+        self.dtype = dtype
         self.currentPosition = 0
-        self.states = []
-        self.actions = []
-        self.rewards = []
-        self.newStates = []
-        self.finals = []
+        self.currentSize = 0
+        self.rng = np.random.default_rng(seed)
+        self.states = None
+        self.actions = None
+        self.rewards = None
+        self.newStates = None
+        self.finals = None
+
+    def _createArray(self, name, shape, dtype):
+        return np.zeros(shape, dtype=dtype)
+
+    def _allocate(self, state):
+        state = np.asarray(state)
+        self.states = self._createArray('states', (self.size,) + state.shape, self.dtype)
+        self.newStates = self._createArray('newStates', (self.size,) + state.shape, self.dtype)
+        self.actions = self._createArray('actions', (self.size,), np.int64)
+        self.rewards = self._createArray('rewards', (self.size,), np.float64)
+        self.finals = self._createArray('finals', (self.size,), np.bool_)
+
+    def sampleIndices(self, size):
+        """
+        Returns `size` slot indices drawn uniformly, with replacement, from the stored transitions.
+        """
+        return self.rng.integers(0, self.currentSize, size)
+
+    def getBatch(self, indices):
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.newStates[indices], self.finals[indices])
+
+    def sample(self, size):
+        """
+        Returns (states, actions, rewards, newStates, finals) arrays for `size` random transitions.
+        """
+        return self.getBatch(self.sampleIndices(size))
 
     def getMiniBatch(self, size) :
-        indices = random.sample(np.arange(len(self.states)), min(size,len(self.states)) )
-        miniBatch = []
-        for index in indices:
-            miniBatch.append({'state': self.states[index],'action': self.actions[index], 'reward': self.rewards[index], 'newState': self.newStates[index], 'isFinal': self.finals[index]})
-        return miniBatch
+        if self.currentSize == 0:
+            # Nothing stored yet, so the arrays are not even allocated
+            return []
+        states, actions, rewards, newStates, finals = self.sample(min(size, self.currentSize))
+        return [{'state': states[i], 'action': actions[i], 'reward': rewards[i], 'newState': newStates[i], 'isFinal': finals[i]}
+                for i in range(len(actions))]
 
     def getCurrentSize(self) :
-        return len(self.states)
+        return self.currentSize
 
-    def getMemory(self, index): 
+    def lastIndex(self):
+        return (self.currentPosition - 1) % self.size
+
+    def getMemory(self, index):
         return {'state': self.states[index],'action': self.actions[index], 'reward': self.rewards[index], 'newState': self.newStates[index], 'isFinal': self.finals[index]}
 
     def addMemory(self, state, action, reward, newState, isFinal) :
-        if (self.currentPosition >= self.size - 1) :
-            self.currentPosition = 0
-        if (len(self.states) > self.size) :
-            self.states[self.currentPosition] = state
-            self.actions[self.currentPosition] = action
-            self.rewards[self.currentPosition] = reward
-            self.newStates[self.currentPosition] = newState
-            self.finals[self.currentPosition] = isFinal
-        else :
-            self.states.append(state)
-            self.actions.append(action)
-            self.rewards.append(reward)
-            self.newStates.append(newState)
-            self.finals.append(isFinal)
-        
-        self.currentPosition += 1
\ No newline at end of file
+        if self.states is None:
+            self._allocate(state)
+        position = self.currentPosition
+        self.states[position] = state
+        self.actions[position] = action
+        self.rewards[position] = reward
+        self.newStates[position] = newState
+        self.finals[position] = isFinal
+
+        self.currentPosition = (position + 1) % self.size
+        self.currentSize = min(self.currentSize + 1, self.size)
+
+    def sampleWeighted(self, size):
+        """
+        Returns (batch, indices, weights) where batch is the sample tuple.
+        Uniform sampling needs no importance-sampling correction, so weights is None.
+        """
+        indices = self.sampleIndices(size)
+        return self.getBatch(indices), indices, None
+
+    def updatePriorities(self, indices, errors):
+        # Uniform replay ignores TD errors
+        pass
+
+
+class SumTree:
+    """
+    Array-backed binary tree where every internal node holds the sum of its two children.
+    Leaves are padded to a power of two so every leaf sits at the same depth, which lets
+    both the priority updates and the proportional lookups run level by level over a
+    whole batch of indices at once, in O(log n) vectorized steps.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.leaves = 1
+        self.depth = 0
+        while self.leaves < capacity:
+            self.leaves *= 2
+            self.depth += 1
+        self.tree = np.zeros(2 * self.leaves - 1)
+
+    def total(self):
+        return self.tree[0]
+
+    def get(self, indices):
+        return self.tree[np.asarray(indices) + self.leaves - 1]
+
+    def update(self, indices, priorities):
+        nodes = np.asarray(indices, dtype=np.int64) + self.leaves - 1
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique((nodes - 1) // 2)
+            self.tree[nodes] = self.tree[2 * nodes + 1] + self.tree[2 * nodes + 2]
+
+    def find(self, values):
+        """
+        Returns, for every value in [0, total), the leaf whose prefix-sum interval contains it.
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.zeros(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes + 1
+            leftSums = self.tree[left]
+            goRight = values >= leftSums
+            values -= leftSums * goRight
+            nodes = left + goRight
+        return nodes - (self.leaves - 1)
+
+
+class PrioritizedMemory(Memory):
+    """
+    Proportional prioritized experience replay (Schaul et al., 2016).
+
+    Transition i is sampled with probability p_i^alpha / sum_j p_j^alpha, where p_i is
+    its last absolute TD error plus a small epsilon; new transitions get the largest
+    priority seen so far so they are replayed at least once. Samples come with
+    importance-sampling weights (N * P(i))^-beta normalized by their maximum, and beta
+    is annealed towards 1 by betaIncrement on every sampled batch.
+    """
+    def __init__(self, size, alpha=0.6, beta=0.4, betaIncrement=1e-4, epsilon=1e-6, seed=None, dtype=np.float32):
+        Memory.__init__(self, size, seed, dtype)
+        self.alpha = alpha
+        self.beta = beta
+        self.betaIncrement = betaIncrement
+        self.epsilon = epsilon
+        self.maxPriority = 1.0
+        self.tree = SumTree(size)
+
+    def addMemory(self, state, action, reward, newState, isFinal):
+        position = self.currentPosition
+        Memory.addMemory(self, state, action, reward, newState, isFinal)
+        self.tree.update([position], [self.maxPriority ** self.alpha])
+
+    def sampleIndices(self, size):
+        # Stratified: one draw from each of `size` equal slices of the total priority
+        segment = self.tree.total() / size
+        values = (np.arange(size) + self.rng.random(size)) * segment
+        indices = self.tree.find(values)
+        # Rounding can walk past the last stored transition into the zero padding
+        return np.minimum(indices, self.currentSize - 1)
+
+    def sampleWeighted(self, size):
+        indices = self.sampleIndices(size)
+        probabilities = self.tree.get(indices) / self.tree.total()
+        weights = (self.currentSize * probabilities) ** -self.beta
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.betaIncrement)
+        return self.getBatch(indices), indices, weights
+
+    def updatePriorities(self, indices, errors):
+        priorities = np.abs(errors) + self.epsilon
+        self.maxPriority = max(self.maxPriority, priorities.max())
+        self.tree.update(indices, priorities ** self.alpha)
+
+
+class MemmapMemory(Memory):
+    """
+    Replay memory whose arrays are memory-mapped .npy files in `directory`, so
+    the collected experience survives a crash or restart and capacities larger
+    than RAM are paged in by the OS on access.
+
+    A small JSON header records the capacity, the number of stored transitions
+    and the ring cursor. It is rewritten atomically after the arrays are flushed,
+    every `flushEvery` insertions and on flush()/close(), so after a crash the
+    memory reopens at the last flushed point. Constructing a MemmapMemory on a
+    directory that already holds one reopens it instead of starting empty.
+    """
+    headerName = 'replay.json'
+
+    def __init__(self, size, directory, flushEvery=1000, seed=None, dtype=np.float32):
+        Memory.__init__(self, size, seed, dtype)
+        self.directory = directory
+        self.flushEvery = flushEvery
+        self._unflushed = 0
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.headerPath = os.path.join(directory, self.headerName)
+        if os.path.exists(self.headerPath):
+            self._reopen()
+
+    def _arrayPath(self, name):
+        return os.path.join(self.directory, name + '.npy')
+
+    def _createArray(self, name, shape, dtype):
+        return np.lib.format.open_memmap(self._arrayPath(name), mode='w+', dtype=dtype, shape=shape)
+
+    def _reopen(self):
+        with open(self.headerPath) as f:
+            header = json.load(f)
+        if header['size'] != self.size:
+            raise ValueError('Replay memory in {} has capacity {}, not {}'.format(self.directory, header['size'], self.size))
+        self.currentSize = header['currentSize']
+        self.currentPosition = header['currentPosition']
+        if header['allocated']:
+            for name in ('states', 'actions', 'rewards', 'newStates', 'finals'):
+                setattr(self, name, np.load(self._arrayPath(name), mmap_mode='r+'))
+
+    def addMemory(self, state, action, reward, newState, isFinal):
+        Memory.addMemory(self, state, action, reward, newState, isFinal)
+        self._unflushed += 1
+        if self._unflushed >= self.flushEvery:
+            self.flush()
+
+    def flush(self):
+        allocated = self.states is not None
+        if allocated:
+            for array in (self.states, self.actions, self.rewards, self.newStates, self.finals):
+                array.flush()
+        # The header is only written once the data it describes is on disk
+        with atomic_write(self.headerPath, fsync=True) as f:
+            json.dump({
+                'size': self.size,
+                'currentSize': self.currentSize,
+                'currentPosition': self.currentPosition,
+                'allocated': allocated,
+            }, f)
+        self._unflushed = 0
+
+    def close(self):
+        self.flush()
+
+
+class FrameMemory(Memory):
+    """
+    Replay memory for pixel observations that stores every uint8 frame once.
+
+    addMemory takes single frames (e.g. the (height, width) grayscale frames of a
+    Gazebo_Lab06_Env with frame_size set) rather than stacks. Consecutive
+    transitions of an episode share their frames: each slot of the ring holds one
+    frame and, unless it is the first frame of an episode, the action, reward and
+    final flag of the transition that led to it. At sample time the states are
+    rebuilt by index as stacks of the last `historyLength` frames, repeating the
+    first frame of the episode where the history is shorter. Compared to storing
+    a float32 stack for both the state and the new state of every transition,
+    this needs 2 * historyLength * 4 times less memory, minus one slot per episode.
+
+    `size` counts frames, so it holds a few less transitions than a Memory of the
+    same size. sample returns (batch, historyLength, height, width) uint8 stacks.
+    """
+    def __init__(self, size, historyLength=4, seed=None):
+        Memory.__init__(self, size, seed)
+        self.historyLength = historyLength
+        self.frames = None
+        self.episodeStarts = None
+
+    def _allocate(self, frame):
+        frame = np.asarray(frame)
+        self.frames = self._createArray('frames', (self.size,) + frame.shape, np.uint8)
+        self.episodeStarts = self._createArray('episodeStarts', (self.size,), np.bool_)
+        self.actions = self._createArray('actions', (self.size,), np.int64)
+        self.rewards = self._createArray('rewards', (self.size,), np.float64)
+        self.finals = self._createArray('finals', (self.size,), np.bool_)
+
+    def _write(self, frame, start):
+        position = self.currentPosition
+        self.frames[position] = frame
+        self.episodeStarts[position] = start
+        self.currentPosition = (position + 1) % self.size
+        self.currentSize = min(self.currentSize + 1, self.size)
+        return position
+
+    def addMemory(self, state, action, reward, newState, isFinal):
+        if self.frames is None:
+            self._allocate(state)
+        # A transition continues the stored episode when its state is the last stored
+        # frame; otherwise (first transition, after a final one or a time limit reset)
+        # the state opens a new episode in its own slot.
+        last = self.lastIndex()
+        if self.currentSize == 0 or self.finals[last] or not np.array_equal(state, self.frames[last]):
+            self._write(state, True)
+        position = self._write(newState, False)
+        self.actions[position] = action
+        self.rewards[position] = reward
+        self.finals[position] = isFinal
+
+    def stackIndices(self, ends):
+        """
+        Returns the (len(ends), historyLength) slot indices of the frame stacks ending
+        at the slots `ends`, oldest first, clamped to the first frame of each episode.
+        """
+        ends = np.asarray(ends, dtype=np.int64)
+        offsets = np.arange(self.historyLength)
+        slots = (ends[:, None] - offsets) % self.size
+        starts = self.episodeStarts[slots]
+        # Frames before the first episode start (walking backwards) belong to an older episode
+        firstStart = np.where(starts.any(axis=1), starts.argmax(axis=1), self.historyLength - 1)
+        slots = (ends[:, None] - np.minimum(offsets, firstStart[:, None])) % self.size
+        return slots[:, ::-1]
+
+    def sampleIndices(self, size):
+        """
+        Returns `size` slots of stored transitions drawn uniformly, with replacement.
+        Once the ring has wrapped, the oldest slots are skipped because the history of
+        their state may already be overwritten.
+        """
+        if self.currentSize < self.size:
+            oldest, minAge = 0, 1
+        else:
+            oldest, minAge = self.currentPosition, self.historyLength
+        indices = np.empty(0, dtype=np.int64)
+        while len(indices) < size:
+            candidates = (oldest + self.rng.integers(minAge, self.currentSize, 2 * size)) % self.size
+            indices = np.concatenate((indices, candidates[~self.episodeStarts[candidates]]))
+        return indices[:size]
+
+    def getBatch(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        states = self.frames[self.stackIndices(indices - 1)]
+        newStates = self.frames[self.stackIndices(indices)]
+        return (states, self.actions[indices], self.rewards[indices], newStates, self.finals[indices])
+
+    def getMemory(self, index):
+        states, actions, rewards, newStates, finals = self.getBatch([index])
+        return {'state': states[0], 'action': actions[0], 'reward': rewards[0], 'newState': newStates[0], 'isFinal': finals[0]}
+
+
+class FrameStack:
+    """
+    Keeps the last `historyLength` frames seen by the actor, so it selects actions
+    on the same stacks FrameMemory rebuilds at sample time.
+
+        stack = FrameStack(4)
+        state = stack.reset(env.reset())
+        ...
+        newState = stack.push(newFrame)
+    """
+    def __init__(self, historyLength=4):
+        self.historyLength = historyLength
+        self.frames = None
+
+    def reset(self, frame):
+        frame = np.asarray(frame, dtype=np.uint8)
+        self.frames = np.repeat(frame[None], self.historyLength, axis=0)
+        return self.frames.copy()
+
+    def push(self, frame):
+        self.frames = np.concatenate((self.frames[1:], np.asarray(frame, dtype=np.uint8)[None]))
+        return self.frames.copy()
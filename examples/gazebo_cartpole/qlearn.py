@@ -1,10 +1,20 @@
 import pickle
-import random
+
+import numpy as np
+from gym_gazebo.utils import seeding, tracing
+
+import qtable
 
 
 class QLearn:
-    def __init__(self, actions, epsilon, alpha, gamma):
-        self.q = {}
+    def __init__(self, actions, epsilon, alpha, gamma, maxStates=None, evictionPolicy="lru",
+                 seed=None, randomBufferSize=4096):
+        # An unbounded dict by default; with maxStates the table evicts old
+        # states so long runs keep a bounded memory and checkpoint size.
+        if maxStates is None:
+            self.q = {}
+        else:
+            self.q = qtable.BoundedQTable(maxStates, evictionPolicy)
         self.epsilon = epsilon  # exploration constant
         self.alpha = alpha      # discount constant
         self.gamma = gamma      # discount factor
@@ -13,6 +23,42 @@ class QLearn:
         self.num_times_learn = 0
         self.num_times_seen_before = 0
 
+        # Exploration draws come from a private generator through a buffer
+        # of uniforms that is refilled in bulk, not one call per draw.
+        self.randomBufferSize = randomBufferSize
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        '''
+        Seeds the exploration generator. The seed is hashed the same way the
+        environments hash theirs, so workers seeded 0, 1, 2, ... still get
+        uncorrelated streams. Returns the seed used, like Env.seed.
+        '''
+        seed = seeding.create_seed(seed)
+        self.rng = np.random.default_rng(seeding.hash_seed(seed))
+        self._uniforms = np.empty(self.randomBufferSize)
+        self._nextUniform = self.randomBufferSize
+        return [seed]
+
+    def _draw(self, n):
+        # Next n uniforms in [0, 1) from the buffer, refilling it when exhausted
+        if self._nextUniform + n > self.randomBufferSize:
+            if n > self.randomBufferSize:
+                return self.rng.random(n)
+            self.rng.random(out=self._uniforms)
+            self._nextUniform = 0
+        values = self._uniforms[self._nextUniform:self._nextUniform + n]
+        self._nextUniform += n
+        return values
+
+    def _uniform(self):
+        if self._nextUniform >= self.randomBufferSize:
+            self.rng.random(out=self._uniforms)
+            self._nextUniform = 0
+        value = self._uniforms[self._nextUniform]
+        self._nextUniform += 1
+        return value
+
     def getQ(self, state, action):
         return self.q.get((state, action), 0.0)
 
@@ -21,7 +67,10 @@ class QLearn:
         Q-learning:
             Q(s, a) += alpha * (reward(s,a) + max(Q(s') - Q(s,a))
         '''
-        oldv = self.q.get((state, action), None)
+        # Reading the old value is part of the update, not a lookup to count
+        # in a BoundedQTable's hit rate
+        peek = getattr(self.q, 'peek', self.q.get)
+        oldv = peek((state, action), None)
         if oldv is None:
             self.q[(state, action)] = reward
         else:
@@ -33,11 +82,12 @@ class QLearn:
         q = [self.getQ(state, a) for a in self.actions]
         maxQ = max(q)
 
-        if random.random() < self.epsilon:
+        if self._uniform() < self.epsilon:
             minQ = min(q)
             mag = max(abs(minQ), abs(maxQ))
             # add random values to all the actions, recalculate maxQ
-            q = [q[i] + random.random() * mag - .5 * mag
+            noise = self._draw(len(self.actions))
+            q = [q[i] + noise[i] * mag - .5 * mag
                  for i in range(len(self.actions))]
             maxQ = max(q)
             #
@@ -48,7 +98,7 @@ class QLearn:
         # we select a random one among them
         if count > 1:
             best = [i for i in range(len(self.actions)) if q[i] == maxQ]
-            i = random.choice(best)
+            i = best[int(self._uniform() * count)]
         else:
             i = q.index(maxQ)
 
@@ -58,15 +108,16 @@ class QLearn:
         return action
 
     def learn(self, state1, action1, reward, state2):
-        maxqnew = max([self.getQ(state2, a) for a in self.actions])
-        self.learnQ(state1, action1, reward, reward + self.gamma*maxqnew)
+        with tracing.span('qlearn_update', 'agent'):
+            maxqnew = max([self.getQ(state2, a) for a in self.actions])
+            self.learnQ(state1, action1, reward, reward + self.gamma*maxqnew)
 
     def saveParams(self, filename):
         # Save stored values
-        with open(filename, 'w') as f:
+        with open(filename, 'wb') as f:
             pickle.dump(self.q, f)
 
     def loadParams(self, filename):
         # Load stored values
-        with open(filename) as f:
+        with open(filename, 'rb') as f:
             self.q = pickle.load(f)
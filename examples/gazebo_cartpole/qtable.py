@@ -0,0 +1,165 @@
+import collections
+import collections.abc
+import heapq
+
+
+class BoundedQTable(collections.abc.MutableMapping):
+    """
+    Sparse Q-table with a cap on the number of resident states.
+
+    It is a drop-in replacement for the plain dict used by QLearn: keys are
+    (state, action) tuples and values are Q-values. Entries are grouped per
+    state, and once maxStates distinct states are stored, inserting a new one
+    evicts a whole state chosen by the eviction policy:
+        - "lru": the state that was read or written least recently
+        - "least_visited": the state with the fewest updates (ties go to the oldest)
+
+    Every write counts as a visit of its state, and every get is counted as a
+    hit or a miss so the table can report how often getQ finds a value; peek
+    reads a value without counting it.
+    """
+    policies = ("lru", "least_visited")
+
+    def __init__(self, maxStates, evictionPolicy="lru"):
+        """
+        Parameters:
+            - maxStates: maximum number of distinct states kept in memory
+            - evictionPolicy: "lru" or "least_visited"
+        """
+        if maxStates < 1:
+            raise ValueError("maxStates must be at least 1, not {}".format(maxStates))
+        if evictionPolicy not in self.policies:
+            raise ValueError("Unknown eviction policy {}: must be one of {}".format(evictionPolicy, self.policies))
+        self.maxStates = maxStates
+        self.evictionPolicy = evictionPolicy
+
+        self._states = collections.OrderedDict()  # state -> {action: value}
+        self.visits = {}                          # state -> number of updates
+        self._heap = []                           # (visits, order, state), lazily refreshed
+        self._order = {}                          # state -> insertion order, the heap tie-breaker
+        self._inserted = 0
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        state, action = key
+        values = self._states.get(state)
+        if values is not None and action in values:
+            self.hits += 1
+            if self.evictionPolicy == "lru":
+                self._states.move_to_end(state)
+            return values[action]
+        self.misses += 1
+        return default
+
+    def peek(self, key, default=None):
+        """
+        Returns the value of key like get, without counting a lookup or refreshing its state.
+        """
+        state, action = key
+        values = self._states.get(state)
+        if values is not None and action in values:
+            return values[action]
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        state, action = key
+        values = self._states.get(state)
+        if values is None:
+            if len(self._states) >= self.maxStates:
+                self._evict()
+            values = self._states[state] = {}
+            self.visits[state] = 0
+            self._order[state] = self._inserted
+            self._inserted += 1
+            self._push(state)
+        elif self.evictionPolicy == "lru":
+            self._states.move_to_end(state)
+        if action not in values:
+            self._size += 1
+        values[action] = value
+        self.visits[state] += 1
+
+    def __delitem__(self, key):
+        state, action = key
+        values = self._states[state]
+        del values[action]
+        self._size -= 1
+        if not values:
+            del self._states[state]
+            del self.visits[state]
+            del self._order[state]
+
+    def __contains__(self, key):
+        # Membership tests are not lookups, so they do not touch the statistics
+        state, action = key
+        values = self._states.get(state)
+        return values is not None and action in values
+
+    def __iter__(self):
+        for state, values in self._states.items():
+            for action in values:
+                yield (state, action)
+
+    def __len__(self):
+        return self._size
+
+    # Bulk iteration reads the storage directly: going through __getitem__
+    # would count lookups and reorder the LRU list while it is being iterated.
+    def items(self):
+        for state, values in self._states.items():
+            for action, value in values.items():
+                yield ((state, action), value)
+
+    def values(self):
+        for values in self._states.values():
+            for value in values.values():
+                yield value
+
+    def stateCount(self):
+        return len(self._states)
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / float(lookups) if lookups else 0.0
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def _push(self, state):
+        if self.evictionPolicy == "least_visited":
+            heapq.heappush(self._heap, (self.visits[state], self._order[state], state))
+
+    def _evict(self):
+        if self.evictionPolicy == "lru":
+            state, values = self._states.popitem(last=False)
+        else:
+            # Heap entries are not updated on every visit; a stale entry is
+            # re-pushed with the current count until the minimum is current.
+            # Entries keep the insertion order of their state, so ties go to
+            # the oldest state however recently it was re-pushed.
+            while True:
+                count, order, state = heapq.heappop(self._heap)
+                if self._order.get(state) != order:
+                    # The state was evicted or deleted since this entry was pushed
+                    continue
+                current = self.visits[state]
+                if current != count:
+                    heapq.heappush(self._heap, (current, order, state))
+                    continue
+                break
+            values = self._states.pop(state)
+        del self.visits[state]
+        del self._order[state]
+        self._size -= len(values)
+        self.evictions += 1
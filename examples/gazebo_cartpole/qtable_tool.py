@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Merge, diff and compact pickled Q-tables.
+
+Q-tables are the pickled {(state, action): value} dicts written by
+QLearn.saveParams / QLearn.saveQ (plain dicts or BoundedQTable), or the .npz
+files written by this tool. Every table is converted to columnar arrays as
+soon as it is loaded: a sorted array of states, the sorted action labels, a
+(states, actions) value matrix with NaN for missing entries, and per-state
+visit counts. Inputs are processed one file at a time, so merging N files
+only ever holds the merged arrays plus one input in memory.
+
+Usage:
+    qtable_tool.py merge OUT IN [IN ...] [--how mean|max]
+    qtable_tool.py diff A B
+    qtable_tool.py compact IN OUT [--dense NUM_STATES]
+"""
+import argparse
+import pickle
+import zipfile
+
+import numpy as np
+
+
+class CompactQTable:
+    """
+    Columnar form of a Q-table.
+
+    Attributes:
+        - states: sorted array of unique states (int64 or unicode)
+        - actions: sorted int64 array of action labels
+        - values: float64 array (len(states), len(actions)), NaN where no value was learned
+        - visits: float64 array (len(states),) used as merge weights
+    """
+    def __init__(self, states, actions, values, visits):
+        self.states = states
+        self.actions = actions
+        self.values = values
+        self.visits = visits
+
+    def __len__(self):
+        return int(np.count_nonzero(~np.isnan(self.values)))
+
+    def toDict(self):
+        """
+        Returns the {(state, action): value} dict that QLearn uses.
+        """
+        rows, cols = np.nonzero(~np.isnan(self.values))
+        states = self.states[rows].tolist()
+        actions = self.actions[cols].tolist()
+        return dict(zip(zip(states, actions), self.values[rows, cols].tolist()))
+
+    def toDense(self, numStates):
+        """
+        Returns a (numStates, actions) array indexed directly by integer state id.
+        Only valid for tables keyed on dense ids, e.g. from discretizer.Discretizer.
+        """
+        if self.states.dtype.kind not in "iu":
+            raise ValueError("Dense export needs integer state ids, not {}".format(self.states.dtype))
+        if len(self.states) and (self.states[0] < 0 or self.states[-1] >= numStates):
+            raise ValueError("State ids must lie in [0, {})".format(numStates))
+        dense = np.full((numStates, len(self.actions)), np.nan)
+        dense[self.states] = self.values
+        return dense
+
+
+def fromDict(q):
+    """
+    Converts a {(state, action): value} mapping into a CompactQTable.
+    """
+    n = len(q)
+    states = np.array([key[0] for key in q.keys()])
+    actions = np.fromiter((key[1] for key in q.keys()), dtype=np.int64, count=n)
+    values = np.fromiter(q.values(), dtype=np.float64, count=n)
+
+    uniqueStates, rows = np.unique(states, return_inverse=True)
+    uniqueActions, cols = np.unique(actions, return_inverse=True)
+    del states, actions
+    table = np.full((len(uniqueStates), len(uniqueActions)), np.nan)
+    table[rows, cols] = values
+
+    # BoundedQTable keeps visit counts; every state of a plain dict weighs 1
+    stateVisits = getattr(q, "visits", None)
+    if stateVisits:
+        visits = np.array([stateVisits.get(s, 1) for s in uniqueStates.tolist()], dtype=np.float64)
+    else:
+        visits = np.ones(len(uniqueStates))
+    return CompactQTable(uniqueStates, uniqueActions, table, visits)
+
+
+def loadTable(path):
+    """
+    Loads a pickled Q-table or a compact .npz table.
+    """
+    if zipfile.is_zipfile(path):
+        with np.load(path, allow_pickle=False) as data:
+            return CompactQTable(data["states"], data["actions"], data["values"], data["visits"])
+    with open(path, "rb") as f:
+        q = pickle.load(f)
+    return fromDict(q)
+
+
+def saveTable(table, path, compressed=False):
+    save = np.savez_compressed if compressed else np.savez
+    with open(path, "wb") as f:
+        save(f, states=table.states, actions=table.actions, values=table.values, visits=table.visits)
+
+
+def _place(matrix, states, actions, newStates, newActions, fill):
+    """
+    Places a (states, actions) or (states,) array on the larger newStates x
+    newActions grid, which must contain every state and action.
+    """
+    rows = np.searchsorted(newStates, states)
+    if matrix.ndim == 1:
+        placed = np.full(len(newStates), fill)
+        placed[rows] = matrix
+        return placed
+    placed = np.full((len(newStates), len(newActions)), fill)
+    placed[rows[:, None], np.searchsorted(newActions, actions)[None, :]] = matrix
+    return placed
+
+
+def _checkKinds(a, b):
+    if len(a) and len(b) and (a.dtype.kind == "U") != (b.dtype.kind == "U"):
+        raise ValueError("Cannot combine tables keyed on {} and {} states".format(a.dtype, b.dtype))
+
+
+def mergeTables(paths, how="mean"):
+    """
+    Merges the Q-tables stored at paths, loading one file at a time.
+
+    Parameters:
+        - paths: pickled or .npz Q-tables
+        - how: "mean" averages each entry weighted by the visits of its state
+               in every table, "max" keeps the largest value
+    """
+    if how not in ("mean", "max"):
+        raise ValueError("Unknown merge method {}: must be mean or max".format(how))
+    # For "mean" acc holds the weighted sum of values, for "max" the running maximum
+    fill = 0.0 if how == "mean" else np.nan
+    states = actions = acc = weights = visits = None
+    for path in paths:
+        table = loadTable(path)
+        tableWeights = np.where(np.isnan(table.values), 0.0, table.visits[:, None])
+        if how == "mean":
+            tableAcc = np.where(tableWeights > 0, table.values, 0.0) * tableWeights
+        else:
+            tableAcc = table.values
+        if states is None:
+            states, actions, acc, weights, visits = table.states, table.actions, tableAcc, tableWeights, table.visits
+            continue
+
+        _checkKinds(states, table.states)
+        newStates = np.union1d(states, table.states)
+        newActions = np.union1d(actions, table.actions)
+        grow = lambda matrix, s, a, f: _place(matrix, s, a, newStates, newActions, f)
+
+        acc, tableAcc = grow(acc, states, actions, fill), grow(tableAcc, table.states, table.actions, fill)
+        acc = acc + tableAcc if how == "mean" else np.fmax(acc, tableAcc)
+        weights = grow(weights, states, actions, 0.0) + grow(tableWeights, table.states, table.actions, 0.0)
+        visits = grow(visits, states, actions, 0.0) + grow(table.visits, table.states, table.actions, 0.0)
+        states, actions = newStates, newActions
+        del table, tableAcc, tableWeights
+
+    if states is None:
+        raise ValueError("No Q-tables to merge")
+    if how == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            acc = np.where(weights > 0, acc / weights, np.nan)
+    return CompactQTable(states, actions, acc, visits)
+
+
+def diffTables(a, b, percentiles=(50, 90, 99)):
+    """
+    Returns summary statistics of the differences between two CompactQTables.
+    """
+    _checkKinds(a.states, b.states)
+    common = np.intersect1d(a.states, b.states)
+    actions = np.intersect1d(a.actions, b.actions)
+    aValues = a.values[np.searchsorted(a.states, common)][:, np.searchsorted(a.actions, actions)]
+    bValues = b.values[np.searchsorted(b.states, common)][:, np.searchsorted(b.actions, actions)]
+    both = ~np.isnan(aValues) & ~np.isnan(bValues)
+    delta = np.abs(aValues[both] - bValues[both])
+
+    # Greedy policy agreement over the states where both tables know every action
+    complete = both.all(axis=1)
+    agree = np.argmax(aValues[complete], axis=1) == np.argmax(bValues[complete], axis=1)
+
+    stats = {
+        "entries_a": len(a),
+        "entries_b": len(b),
+        "states_a": len(a.states),
+        "states_b": len(b.states),
+        "states_common": len(common),
+        "states_only_a": len(a.states) - len(common),
+        "states_only_b": len(b.states) - len(common),
+        "entries_common": int(delta.size),
+        "mean_abs_diff": float(delta.mean()) if delta.size else 0.0,
+        "max_abs_diff": float(delta.max()) if delta.size else 0.0,
+        "rms_diff": float(np.sqrt(np.mean(delta ** 2))) if delta.size else 0.0,
+        "policy_agreement": float(agree.mean()) if agree.size else float("nan"),
+    }
+    for p, value in zip(percentiles, np.percentile(delta, percentiles) if delta.size else [0.0] * len(percentiles)):
+        stats["p{}_abs_diff".format(p)] = float(value)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge, diff and compact pickled Q-tables.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    merge = commands.add_parser("merge", help="merge several tables into one compact table")
+    merge.add_argument("output")
+    merge.add_argument("inputs", nargs="+")
+    merge.add_argument("--how", choices=("mean", "max"), default="mean")
+    merge.add_argument("--pickle", action="store_true", help="write a pickled dict instead of .npz")
+
+    diff = commands.add_parser("diff", help="print summary statistics of the differences between two tables")
+    diff.add_argument("a")
+    diff.add_argument("b")
+
+    compact = commands.add_parser("compact", help="convert a table to the compact array format")
+    compact.add_argument("input")
+    compact.add_argument("output")
+    compact.add_argument("--dense", type=int, metavar="NUM_STATES",
+                         help="write a dense (NUM_STATES, actions) .npy array indexed by integer state id")
+    compact.add_argument("--compress", action="store_true")
+
+    args = parser.parse_args(argv)
+    if args.command == "merge":
+        table = mergeTables(args.inputs, args.how)
+        if args.pickle:
+            with open(args.output, "wb") as f:
+                pickle.dump(table.toDict(), f)
+        else:
+            saveTable(table, args.output)
+        print("Merged {} tables into {} ({} states, {} entries)".format(len(args.inputs), args.output, len(table.states), len(table)))
+    elif args.command == "diff":
+        for key, value in diffTables(loadTable(args.a), loadTable(args.b)).items():
+            print("{}: {}".format(key, value))
+    else:
+        table = loadTable(args.input)
+        if args.dense is not None:
+            with open(args.output, "wb") as f:
+                np.save(f, table.toDense(args.dense))
+        else:
+            saveTable(table, args.output, compressed=args.compress)
+        print("Wrote {} ({} states, {} entries)".format(args.output, len(table.states), len(table)))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ import time
 
 import qlearn
 import liveplot
+import discretizer
 
 import os.path
 from os import path
@@ -28,9 +29,15 @@ class StateActionReward:
         self.action = action
         self.reward = reward
 
+state_discretizer = discretizer.cartPoleDiscretizer()
+
 def parseStateActionRewardData(state_action, reward):
     # Parse out state and action
     state_str, action = state_action
+    if isinstance(state_str, int):
+        # Integer state ids decode straight back to bin centres
+        state = state_discretizer.decodeValues(state_str).tolist()
+        return StateActionReward(state, action, reward)
     state_str = state_str[0] + '.00.' + state_str[1:] ## HARDCODE
     state = stateStrToState(state_str)
     if state is None:
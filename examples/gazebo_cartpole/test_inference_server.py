@@ -0,0 +1,78 @@
+import threading
+import time
+
+import numpy as np
+
+from inference_server import InferenceServer
+
+
+class SlowModel:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def predict(self, states):
+        self.release.wait()
+        return states * 2
+
+
+def test_requests_racing_stop_are_answered_or_fail():
+    model = SlowModel()
+    server = InferenceServer(model, maxBatchSize=1, maxLatency=0)
+    server.start()
+    outcomes = []
+
+    def actor(value):
+        try:
+            outcomes.append(server.getQValues(np.array([value], dtype=np.float32))[0])
+        except RuntimeError:
+            outcomes.append('stopped')
+
+    actors = [threading.Thread(target=actor, args=(i,)) for i in range(8)]
+    for thread in actors:
+        thread.start()
+    stopper = threading.Thread(target=server.stop)
+    stopper.start()
+    model.release.set()
+    for thread in actors + [stopper]:
+        thread.join(5)
+        assert not thread.is_alive(), 'A caller was left waiting'
+
+    assert len(outcomes) == 8
+    for outcome in outcomes:
+        assert outcome == 'stopped' or outcome % 2 == 0
+
+
+def test_get_q_values_raises_after_stop():
+    server = InferenceServer(SlowModel())
+    server.start()
+    server.stop()
+    try:
+        server.getQValues(np.zeros(2))
+    except RuntimeError:
+        pass
+    else:
+        assert False, 'Expected a stopped server to refuse requests'
+
+
+def test_stop_fails_requests_of_a_server_never_started():
+    server = InferenceServer(SlowModel())
+    errors = []
+
+    def waiter():
+        try:
+            server.getQValues(np.zeros(2))
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=waiter)
+    thread.daemon = True
+    thread.start()
+    deadline = time.time() + 5
+    while server.requests.empty() and time.time() < deadline:
+        time.sleep(0.001)
+    assert not server.requests.empty(), 'The request was never queued'
+    server.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert len(errors) == 1
+    assert 'stopped before answering' in str(errors[0])
@@ -0,0 +1,56 @@
+from learner import Learner
+
+
+class StepModel:
+    def __init__(self):
+        self.step = 0
+
+    def get_weights(self):
+        return [self.step]
+
+
+class ReadyMemory:
+    def getCurrentSize(self):
+        return 1
+
+    def sampleWeighted(self, size):
+        return [], [], []
+
+    def updatePriorities(self, indices, tdErrors):
+        pass
+
+
+class FakeDeepQ:
+    learnStart = 0
+
+    def __init__(self, stopAt):
+        self.model = StepModel()
+        self.memory = ReadyMemory()
+        self.actorWeights = None
+        self.stopAt = stopAt
+        self.learner = None
+
+    def trainOnBatch(self, batch, weights, useTargetNetwork):
+        self.model.step += 1
+        if self.model.step == self.stopAt:
+            self.learner._stopEvent.set()
+        return []
+
+    def updateTargetNetwork(self, publish=True):
+        if publish:
+            self.publishWeights(self.model.get_weights())
+
+    def publishWeights(self, weights):
+        self.actorWeights = weights
+
+
+def test_target_update_does_not_roll_the_actor_back():
+    deepQ = FakeDeepQ(stopAt=150)
+    learner = Learner(deepQ, miniBatchSize=1, publishEvery=100, updateTargetEvery=150)
+    deepQ.learner = learner
+    # Run the learner loop on this thread; the actor has not synced the step 100 publish
+    learner.run()
+    assert learner.error is None
+    assert learner.syncActor()
+    assert deepQ.actorWeights == [150]
+    assert not learner.syncActor()
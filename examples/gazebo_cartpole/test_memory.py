@@ -0,0 +1,24 @@
+import numpy as np
+
+import memory
+
+
+def test_int_first_state_does_not_truncate_float_states():
+    replay = memory.Memory(4)
+    replay.addMemory([0, 1], 0, 1.0, [1, 2], False)
+    replay.addMemory([0.25, -1.5], 1, 0.0, [0.75, 2.5], True)
+    assert replay.states.dtype == np.float32
+    assert replay.getMemory(1)['state'].tolist() == [0.25, -1.5]
+    assert replay.getMemory(1)['newState'].tolist() == [0.75, 2.5]
+
+
+def test_explicit_state_dtype():
+    replay = memory.Memory(4, dtype=np.float64)
+    replay.addMemory([0, 1], 0, 1.0, [0.1, 2], False)
+    assert replay.newStates.dtype == np.float64
+    assert replay.getMemory(0)['newState'][0] == 0.1
+
+
+def test_mini_batch_of_empty_memory_is_empty():
+    assert memory.Memory(4).getMiniBatch(8) == []
+    assert memory.PrioritizedMemory(4).getMiniBatch(8) == []
@@ -0,0 +1,23 @@
+import qlearn
+import qtable
+
+
+def test_least_visited_ties_go_to_the_oldest_state():
+    table = qtable.BoundedQTable(3, "least_visited")
+    for state in "faebd":
+        table[(state, 0)] = 1.0
+    # "e" and "b" reach two visits after their stale heap entries were re-pushed, "e" first inserted
+    for state in "deb":
+        table[(state, 0)] = 2.0
+    table[("c", 0)] = 1.0
+    assert ("e", 0) not in table
+    assert sorted(state for state, _ in table) == ["b", "c", "d"]
+
+
+def test_hit_rate_counts_only_caller_lookups():
+    learner = qlearn.QLearn(actions=[0, 1], epsilon=0.0, alpha=0.5, gamma=0.9, maxStates=10, seed=0)
+    learner.learn("s", 0, 1.0, "t")
+    # Two getQ lookups of "t" in learn, none from the update itself
+    assert learner.q.hits + learner.q.misses == 2
+    assert learner.getQ("s", 0) == 1.0
+    assert learner.q.hits == 1
@@ -0,0 +1,21 @@
+import numpy as np
+
+import tilecoding
+
+
+def test_no_line_has_its_own_tiles():
+    coder = tilecoding.lab06TileCoder()
+    noLine = coder.indices(tilecoding.lab06Observation(None))
+    onLine = coder.indices(np.linspace(0, 1, 1001)[:, None])
+    assert not (onLine == noLine).any()
+    assert (coder.indices(tilecoding.lab06Observation(0.5)) == coder.indices(np.array([0.5]))).all()
+
+
+def test_nan_observations_raise():
+    coder = tilecoding.lab06TileCoder()
+    try:
+        coder.indices(np.array([np.nan]))
+    except ValueError:
+        pass
+    else:
+        assert False, 'Expected NaN observations to be rejected'
@@ -0,0 +1,170 @@
+import math
+import random
+
+import numpy as np
+
+# Large odd multipliers for hashing tile coordinates (wrap around in uint64)
+_HASH_PRIMES = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                         0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53],
+                        dtype=np.uint64)
+
+
+class TileCoder:
+    """
+    Hashed tile coding of continuous observations.
+
+    The box [low, high] is covered by numTilings grids of tilesPerDim tiles per
+    dimension, each grid shifted by a fraction of a tile. An observation
+    activates exactly one tile per tiling, and the tile coordinates are hashed
+    into [0, memorySize), so memory stays fixed however many distinct states
+    are visited. Values outside the box keep hashing to distinct tiles.
+    """
+    def __init__(self, low, high, numTilings=8, tilesPerDim=8, memorySize=4096):
+        """
+        Parameters:
+            - low, high: per-dimension bounds of the region to tile
+            - numTilings: number of offset tilings (active features per observation)
+            - tilesPerDim: number of tiles along each dimension of one tiling
+            - memorySize: number of hashed features
+        """
+        self.low = np.asarray(low, dtype=np.float64).reshape(-1)
+        self.high = np.asarray(high, dtype=np.float64).reshape(-1)
+        if self.low.shape != self.high.shape or np.any(self.high <= self.low):
+            raise ValueError("high must be greater than low in every dimension")
+        self.dims = len(self.low)
+        self.numTilings = numTilings
+        self.memorySize = memorySize
+        self.scale = tilesPerDim / (self.high - self.low)
+
+        # Asymmetric offsets (1, 3, 5, ... tile widths / numTilings) avoid the
+        # diagonal artifacts of shifting every dimension by the same amount.
+        displacement = 2 * np.arange(self.dims) + 1
+        self.offsets = (np.arange(numTilings)[:, None] * displacement[None, :] / float(numTilings)) % 1.0
+        self._tilingSeeds = np.arange(numTilings, dtype=np.uint64) * _HASH_PRIMES[0]
+        self._primes = _HASH_PRIMES[1 + np.arange(self.dims) % (len(_HASH_PRIMES) - 1)]
+
+    def indices(self, observations):
+        """
+        Returns the active feature indices as an int64 array of shape
+        (numTilings,) for one observation, or (batch, numTilings) for a batch.
+        NaN has no tile, so observations containing one raise ValueError.
+        """
+        observations = np.asarray(observations, dtype=np.float64)
+        if np.isnan(observations).any():
+            raise ValueError("Cannot tile code NaN observations")
+        single = observations.ndim == 1
+        observations = observations.reshape(-1, 1, self.dims)
+        coords = np.floor((observations - self.low) * self.scale + self.offsets).astype(np.int64)
+        hashed = self._tilingSeeds + (coords.astype(np.uint64) * self._primes).sum(axis=2, dtype=np.uint64)
+        hashed ^= hashed >> np.uint64(29)
+        indices = (hashed % np.uint64(self.memorySize)).astype(np.int64)
+        return indices[0] if single else indices
+
+
+class TileCodingQ:
+    """
+    Linear action-value function over hashed tiles, usable in place of QLearn.
+
+    Q(s, a) is the sum of the weights of the tiles active in s, so a lookup is
+    one gather from a (memorySize, len(actions)) weight array. States are raw
+    observation vectors rather than string or integer keys.
+    """
+    def __init__(self, actions, epsilon, alpha, gamma, coder):
+        """
+        Parameters:
+            - actions: the actions that can be taken
+            - epsilon: exploration rate
+            - alpha: learning rate, shared between the active tiles
+            - gamma: discount factor
+            - coder: TileCoder mapping observations to feature indices
+        """
+        self.actions = list(actions)
+        self._columns = dict((a, i) for i, a in enumerate(self.actions))
+        self.epsilon = epsilon
+        self.alpha = alpha
+        self.gamma = gamma
+        self.coder = coder
+        self.weights = np.zeros((coder.memorySize, len(self.actions)), dtype=np.float64)
+
+    def getQValues(self, state):
+        """
+        Returns Q(state, a) for every action, or a (batch, actions) array for a batch of states.
+        """
+        return self.weights[self.coder.indices(state)].sum(axis=-2)
+
+    def getQ(self, state, action):
+        return self.weights[self.coder.indices(state), self._columns[action]].sum()
+
+    def chooseAction(self, state, return_q=False):
+        q = self.getQValues(state)
+        if random.random() < self.epsilon:
+            i = random.randrange(len(self.actions))
+        else:
+            best = np.flatnonzero(q == q.max())
+            i = best[0] if len(best) == 1 else random.choice(best)
+        action = self.actions[i]
+        if return_q:
+            return action, q
+        return action
+
+    def learn(self, state1, action1, reward, state2, done=False):
+        """
+        Q(s1, a1) += alpha * (reward + gamma * max(Q(s2)) - Q(s1, a1))
+        """
+        self.learnBatch([state1], [action1], [reward], [state2], [done])
+
+    def learnBatch(self, states, actions, rewards, newStates, dones):
+        """
+        Applies the Q-learning update to a batch of transitions in one pass.
+        """
+        indices = self.coder.indices(np.asarray(states, dtype=np.float64).reshape(-1, self.coder.dims))
+        columns = np.array([self._columns[a] for a in actions], dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=np.float64)
+        notDone = 1.0 - np.asarray(dones, dtype=np.float64)
+
+        maxQNew = self.getQValues(np.asarray(newStates, dtype=np.float64).reshape(-1, self.coder.dims)).max(axis=1)
+        target = rewards + self.gamma * maxQNew * notDone
+        current = self.weights[indices, columns[:, None]].sum(axis=1)
+        step = (self.alpha / self.coder.numTilings) * (target - current)
+        # add.at accumulates correctly when two transitions share a tile
+        np.add.at(self.weights, (indices, np.repeat(columns[:, None], indices.shape[1], axis=1)), step[:, None])
+
+    def saveParams(self, filename):
+        np.save(filename, self.weights)
+
+    def loadParams(self, filename):
+        self.weights = np.load(filename)
+
+
+def cartPoleTileCoder(numTilings=8, tilesPerDim=8, memorySize=4096, thetaDotLimit=4.0):
+    """
+    TileCoder over GazeboCartPolev0Env observations [x, x_dot, theta, theta_dot].
+    """
+    thetaThreshold = 12 * 2 * math.pi / 360
+    return TileCoder(low=[-15, -1, -thetaThreshold, -thetaDotLimit],
+                     high=[15, 1, thetaThreshold, thetaDotLimit],
+                     numTilings=numTilings, tilesPerDim=tilesPerDim, memorySize=memorySize)
+
+
+# Centroid standing for "no line detected"; outside [0, 1], so it has tiles of its own
+NO_LINE_CENTROID = -1.0
+
+
+def lab06TileCoder(numTilings=8, tilesPerDim=10, memorySize=1024):
+    """
+    TileCoder over the normalized line centroid reported by Gazebo_Lab06_Env
+    in info['centroid'] (0 is the left edge of the image, 1 the right edge).
+    Encode centroids through lab06Observation, which maps a missing line to
+    NO_LINE_CENTROID.
+    """
+    return TileCoder(low=[0.0], high=[1.0],
+                     numTilings=numTilings, tilesPerDim=tilesPerDim, memorySize=memorySize)
+
+
+def lab06Observation(centroid):
+    """
+    Observation for lab06TileCoder from a Gazebo_Lab06_Env centroid: info['centroid']
+    after a step, or env.unwrapped.centroid after a reset. None (no line detected)
+    becomes NO_LINE_CENTROID.
+    """
+    return np.array([NO_LINE_CENTROID if centroid is None else centroid], dtype=np.float64)
@@ -7,10 +7,9 @@
 
 
 import gym
-from gym import wrappers
+from gym_gazebo import wrappers
 import gym_gazebo
 import time
-import numpy
 import random
 import time
 import qlearn
@@ -37,11 +36,9 @@ if __name__ == '__main__':
     # Setup environment with the reward system and liveplot
     env = gym.make('Gazebo_Lab06-v0')
     outdir = '/tmp/gazebo_gym_experiments'
-    env = gym.wrappers.Monitor(env, outdir, force=True)
+    env = wrappers.Monitor(env, outdir, force=True, flush_every_episodes=10)
     plotter = liveplot.LivePlot(outdir)
 
-    last_time_steps = numpy.ndarray(0)
-
     # Initialize the qlearning model. The alpha value os the learning rate, the gamma value is the consideration of future rewards,
     # and the epsilon is the exploration vs exploitation setting
     qlearn = qlearn.QLearn(actions=range(env.action_space.n),
@@ -96,12 +93,9 @@ if __name__ == '__main__':
             # Update Q-Values
             qlearn.learn(state, action, reward, nextState)
 
-            env._flush(force=True)
-
             if not(done):
                 state = nextState
             else:
-                last_time_steps = numpy.append(last_time_steps, [int(i + 1)])
                 break
 
         print("===== Completed episode {}".format(x))
@@ -126,12 +120,12 @@ if __name__ == '__main__':
            str(qlearn.gamma)+"|"+str(initial_epsilon)+"*" +
            str(epsilon_discount)+"|"+str(highest_reward) + "| PICTURE |")
 
-    l = last_time_steps.tolist()
-    l.sort()
+    length_stats = env.get_length_stats()
 
     # print("Parameters: a="+str)
-    print("Overall score: {:0.2f}".format(last_time_steps.mean()))
-    print("Best 100 score: {:0.2f}".
-          format(reduce(lambda x, y: x + y, l[-100:]) / len(l[-100:])))
+    print("Overall score: {:0.2f}".format(length_stats.mean))
+    print("Best 100 score: {:0.2f}".format(length_stats.best_mean()))
 
+    plotter.plot(env)
+    plotter.close()
     env.close()
@@ -5,10 +5,12 @@
 #  to choose an action and to also fill in the Qtable. Finally the class can be used
 #  to store the Q table as a pickle file, or load a previous Q file
 
-import random
 import pickle
 import csv
 
+import numpy as np
+from gym_gazebo.utils import seeding, tracing
+
 
 ## QLearn Class provides functionality for Q Reinforcement Learning
 #
@@ -21,13 +23,52 @@ class QLearn:
     #  @param epsilon the exploration-exploitation control value for choosing the next action
     #  @param alpha the learning rate
     #  @param gamma the the discounting value of future rewards
-    def __init__(self, actions, epsilon, alpha, gamma):
+    #  @param seed (default = None) seed for the exploration random number generator
+    #  @param randomBufferSize (default = 4096) number of uniforms drawn from the generator at a time
+    def __init__(self, actions, epsilon, alpha, gamma, seed=None, randomBufferSize=4096):
         self.q = {}
         self.epsilon = epsilon  # exploration constant
         self.alpha = alpha      # discount constant
         self.gamma = gamma      # discount factor
         self.actions = actions
 
+        self.randomBufferSize = randomBufferSize
+        self.seed(seed)
+
+
+    ## seed function seeds the private exploration generator
+    #  The seed is hashed like the environment seeds, so workers seeded 0, 1, 2, ... get uncorrelated streams
+    #  @param seed (default = None) the seed, a fresh one is drawn from the OS if omitted
+    def seed(self, seed=None):
+        seed = seeding.create_seed(seed)
+        self.rng = np.random.default_rng(seeding.hash_seed(seed))
+        self._uniforms = np.empty(self.randomBufferSize)
+        self._nextUniform = self.randomBufferSize
+        return [seed]
+
+
+    ## _draw function returns the next n uniforms in [0, 1) from the buffer, refilling it in bulk when exhausted
+    #  @param n the number of values needed
+    def _draw(self, n):
+        if self._nextUniform + n > self.randomBufferSize:
+            if n > self.randomBufferSize:
+                return self.rng.random(n)
+            self.rng.random(out=self._uniforms)
+            self._nextUniform = 0
+        values = self._uniforms[self._nextUniform:self._nextUniform + n]
+        self._nextUniform += n
+        return values
+
+
+    ## _uniform function returns a single uniform in [0, 1) from the buffer
+    def _uniform(self):
+        if self._nextUniform >= self.randomBufferSize:
+            self.rng.random(out=self._uniforms)
+            self._nextUniform = 0
+        value = self._uniforms[self._nextUniform]
+        self._nextUniform += 1
+        return value
+
 
     
     ## loadQ function loads the Q-values from a pickle file
@@ -77,7 +118,7 @@ class QLearn:
         q = [self.getQ(state, a) for a in self.actions]
         maxQ = max(q)
 
-        if random.random() < self.epsilon:
+        if self._uniform() < self.epsilon:
 
             # Alternate algorithm for chosing an action
             #rand_val = random.random()
@@ -90,14 +131,15 @@ class QLearn:
             # This ensures that actions choices are not too distant/volatile.
             minQ = min(q)
             mag = max(abs(minQ), abs(maxQ))
-            q = [q[i] + random.random() * mag - .5*mag for i in range(len(self.actions))]
+            noise = self._draw(len(self.actions))
+            q = [q[i] + noise[i] * mag - .5*mag for i in range(len(self.actions))]
             maxQ = max(q)
         
         ## Accounts for the possibility of having two of the same max Q values
         count = q.count(maxQ)
         if count > 1:
             best = [i for i in range(len(self.actions)) if q[i] == maxQ]
-            i = random.choice(best)
+            i = best[int(self._uniform() * count)]
         else:
             i = q.index(maxQ)
 
@@ -116,8 +158,9 @@ class QLearn:
     #  @param reward the reward for taking the action
     #  @param state2 the subsequent state
     def learn(self, state1, action1, reward, state2):
-        maxqnew = max([self.getQ(state2, a) for a in self.actions])
-        self.learnQ( state1, action1, reward, reward + self.gamma*maxqnew)
+        with tracing.span('qlearn_update', 'agent'):
+            maxqnew = max([self.getQ(state2, a) for a in self.actions])
+            self.learnQ( state1, action1, reward, reward + self.gamma*maxqnew)
 
 
     ## learnQ updates Q-value based on provided parameters
@@ -17,6 +17,7 @@ from trajectory_msgs.msg import JointTrajectory, JointTrajectoryPoint
 from std_msgs.msg import Float64
 from gazebo_msgs.srv import SetLinkState
 from gazebo_msgs.msg import LinkState
+from gym_gazebo.utils import tracing
 
 
 class GazeboCartPolev0Env(gazebo_env.GazeboEnv):
@@ -64,24 +65,31 @@ class GazeboCartPolev0Env(gazebo_env.GazeboEnv):
         return [seed]
 
     def step(self, action):
+        timings = {}
         # Unpause simulation to make observations
-        rospy.wait_for_service('/gazebo/unpause_physics')
-        try:
-            self.unpause()
-        except (rospy.ServiceException) as e:
-            print ("/gazebo/pause_physics service call failed")
+        with tracing.span('unpause', 'service') as span:
+            rospy.wait_for_service('/gazebo/unpause_physics')
+            try:
+                self.unpause()
+            except (rospy.ServiceException) as e:
+                print ("/gazebo/pause_physics service call failed")
+        timings['unpause'] = span.duration
 
         # Wait for data
-        data = self.data
-        while data is None:
+        with tracing.span('joint_states_wait', 'topic') as span:
             data = self.data
+            while data is None:
+                data = self.data
+        timings['joint_states_wait'] = span.duration
 
         # Pause
-        rospy.wait_for_service('/gazebo/pause_physics')
-        try:
-            self.pause()
-        except (rospy.ServiceException) as e:
-            print ("/gazebo/unpause_physics service call failed")
+        with tracing.span('pause', 'service') as span:
+            rospy.wait_for_service('/gazebo/pause_physics')
+            try:
+                self.pause()
+            except (rospy.ServiceException) as e:
+                print ("/gazebo/unpause_physics service call failed")
+        timings['pause'] = span.duration
 
         # Take action
         if action > 0.5:
@@ -91,7 +99,9 @@ class GazeboCartPolev0Env(gazebo_env.GazeboEnv):
 
         action_msg = Float64()
         action_msg.data = self.current_vel
-        self._pub.publish(action_msg)
+        with tracing.span('publish', 'topic') as span:
+            self._pub.publish(action_msg)
+        timings['publish'] = span.duration
 
         # Define state
         x = self.data.position[1]
@@ -118,32 +128,36 @@ class GazeboCartPolev0Env(gazebo_env.GazeboEnv):
 
         # Reset data
         self.data = None
-        return state, reward, done, {}
+        return state, reward, done, {'phase_timings': timings}
 
     def reset(self):
         # Reset world
-        rospy.wait_for_service('/gazebo/set_link_state')
-        self.set_link(LinkState(link_name='pole'))
-        self.set_link(LinkState(link_name='cart'))
+        with tracing.span('set_link_state', 'service'):
+            rospy.wait_for_service('/gazebo/set_link_state')
+            self.set_link(LinkState(link_name='pole'))
+            self.set_link(LinkState(link_name='cart'))
 
         # Unpause simulation to make observation
-        rospy.wait_for_service('/gazebo/unpause_physics')
-        try:
-            self.unpause()
-        except (rospy.ServiceException) as e:
-            print ("/gazebo/unpause_physics service call failed")
+        with tracing.span('unpause', 'service'):
+            rospy.wait_for_service('/gazebo/unpause_physics')
+            try:
+                self.unpause()
+            except (rospy.ServiceException) as e:
+                print ("/gazebo/unpause_physics service call failed")
 
         # Wait for data
-        data = self.data
-        while data is None:
+        with tracing.span('joint_states_wait', 'topic'):
             data = self.data
+            while data is None:
+                data = self.data
 
         # Pause simulation
-        rospy.wait_for_service('/gazebo/pause_physics')
-        try:
-            self.pause()
-        except (rospy.ServiceException) as e:
-            print ("/gazebo/pause_physics service call failed")
+        with tracing.span('pause', 'service'):
+            rospy.wait_for_service('/gazebo/pause_physics')
+            try:
+                self.pause()
+            except (rospy.ServiceException) as e:
+                print ("/gazebo/pause_physics service call failed")
 
         # Process state
         x = self.data.position[1]
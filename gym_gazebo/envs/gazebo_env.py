@@ -9,6 +9,7 @@ import time
 from std_srvs.srv import Empty
 import random
 from rosgraph_msgs.msg import Clock
+from gym_gazebo.utils import tracing
 
 class GazeboEnv(gym.Env):
     """Superclass for all Gazebo environments.
@@ -50,13 +51,14 @@ class GazeboEnv(gym.Env):
         if not os.path.exists(fullpath):
             raise IOError("File "+fullpath+" does not exist")
 
-        self._roslaunch = subprocess.Popen([sys.executable, os.path.join(ros_path, b"roslaunch"), "-p", self.port, fullpath])
-        print ("Gazebo launched!")
+        with tracing.span('launch'):
+            self._roslaunch = subprocess.Popen([sys.executable, os.path.join(ros_path, b"roslaunch"), "-p", self.port, fullpath])
+            print ("Gazebo launched!")
 
-        self.gzclient_pid = 0
+            self.gzclient_pid = 0
 
-        # Launch the simulation with the given launchfile name
-        rospy.init_node('gym', anonymous=True)
+            # Launch the simulation with the given launchfile name
+            rospy.init_node('gym', anonymous=True)
 
         ################################################################################################################
         # r = rospy.Rate(1)
@@ -97,6 +99,16 @@ class GazeboEnv(gym.Env):
         # Implemented in subclass
         raise NotImplementedError
 
+    def render(self, mode="human", close=False):
+        if mode == "rgb_array":
+            return self._render_rgb_array()
+        return self._render(mode, close)
+
+    def _render_rgb_array(self):
+
+        # Implemented in subclasses that can provide camera frames
+        raise NotImplementedError
+
     def _render(self, mode="human", close=False):
 
         if close:
@@ -21,6 +21,7 @@ from std_srvs.srv import Empty
 from sensor_msgs.msg import Image
 from time import sleep
 from gym.utils import seeding
+from gym_gazebo.utils import tracing
 
 ## Gazebo_Lab06_Env Class creates an ROS and gym-gazebo environments for line following Q-learning
 #
@@ -29,6 +30,9 @@ from gym.utils import seeding
 #  chosen. Finally it can reset the robot in the environment and can also seed the robot at the start (randomly).
 class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
 
+    # rgb_array frames come from the robot camera, so videos need no gzclient.
+    metadata = {'render.modes': ['human', 'rgb_array'], 'video.frames_per_second': 10}
+
     ## Initialization function iniitializes the ROS environment and robot along with Subsciption and Publishing
     #  The functino also intializes the gazebo physics engine.
     def __init__(self):
@@ -49,6 +53,20 @@ class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
 
         self.bridge = CvBridge()
         self.timeout = 0  # Used to keep track of images with no line detected
+        self.centroid = None  # Horizontal line position in [0, 1], None when no line is detected
+        self.last_frame = None  # Last decoded camera frame (BGR)
+
+        # Pixel observations: set frame_size to (width, height) to have step and reset
+        # return the preprocessed camera frame instead of the 10 element state
+        self.frame_size = None
+        self.grayscale = True
+
+        # rgb_array rendering: render_size = (width, height) downscales the camera frame,
+        # and render_skip = n only converts every nth frame, repeating it in between
+        self.render_size = None
+        self.render_skip = 1
+        self._render_calls = 0
+        self._rendered_frame = None
 
         self.lower_blue = np.array([97,  0,   0])
         self.upper_blue = np.array([150, 255, 255])
@@ -65,6 +83,7 @@ class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
             cv_image = self.bridge.imgmsg_to_cv2(data, "bgr8")
         except CvBridgeError as e:
             print(e)
+        self.last_frame = cv_image
 
         # Please note that the state space can be increased by dividing the picture into smaller subdivisions (different styles of alterations are possible like 2 layers)
 
@@ -84,6 +103,7 @@ class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
         
 
             rows, cols = binary.shape
+            self.centroid = cX / float(cols)
 
             # Break image into 10 vertical columns (10 states)
             spacing = cols/10
@@ -99,6 +119,7 @@ class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
                 upperbound += spacing
                 
         else:
+            self.centroid = None
             self.timeout += 1
 
         if (self.timeout > 30):
@@ -107,6 +128,40 @@ class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
         return state, done
 
 
+    ## The preprocess_frame function downsamples a camera frame into a compact uint8 pixel observation
+    #  The frame is converted to grayscale (unless grayscale is False) and resized to frame_size with
+    #  area interpolation, so it can be stored as is in an image replay memory.
+    #  @param cv_image the BGR frame decoded from the camera feed
+    def preprocess_frame(self, cv_image):
+        if self.grayscale:
+            cv_image = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
+        frame = cv2.resize(cv_image, tuple(self.frame_size), interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(frame, dtype=np.uint8)
+
+    ## The observation function returns the preprocessed last frame when pixel observations are enabled,
+    #  and the state otherwise
+    #  @param state the state computed by process_image
+    def observation(self, state):
+        if self.frame_size is None:
+            return state
+        return self.preprocess_frame(self.last_frame)
+
+    ## The _render_rgb_array function returns the last camera frame decoded by step or reset as an RGB array
+    #  The frame is downscaled to render_size when set. With render_skip = n, only every nth call converts a new
+    #  frame and the others repeat the previous one, so videos keep one frame per step. Returns None before
+    #  the first camera image.
+    def _render_rgb_array(self):
+        self._render_calls += 1
+        if self.last_frame is None:
+            return None
+        if self._rendered_frame is not None and (self._render_calls - 1) % self.render_skip:
+            return self._rendered_frame
+        frame = self.last_frame
+        if self.render_size is not None:
+            frame = cv2.resize(frame, tuple(self.render_size), interpolation=cv2.INTER_AREA)
+        self._rendered_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return self._rendered_frame
+
     ## The seed function seeds the robot at the start of the episode
     #  @param seed (default = None) seed for the robot
     def _seed(self, seed=None):
@@ -114,14 +169,19 @@ class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
         return [seed]
 
     ## The step function publishes an action to the robot depending on the action chosen and then provides the rewards gained
+    #  The info dictionary carries the normalized line centroid under 'centroid' for function approximators
+    #  When frame_size is set, the observation is the preprocessed camera frame (see preprocess_frame)
     #  @param action the action being taken (ie. left, right, forward)
     def step(self, action):
 
-        rospy.wait_for_service('/gazebo/unpause_physics')
-        try:
-            self.unpause()
-        except (rospy.ServiceException) as e:
-            print ("/gazebo/unpause_physics service call failed")
+        timings = {}
+        with tracing.span('unpause', 'service') as span:
+            rospy.wait_for_service('/gazebo/unpause_physics')
+            try:
+                self.unpause()
+            except (rospy.ServiceException) as e:
+                print ("/gazebo/unpause_physics service call failed")
+        timings['unpause'] = span.duration
 
         self.episode_history.append(action)
 
@@ -139,26 +199,34 @@ class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
             vel_cmd.angular.z = -0.25
 
         # publish the action to the robot
-        self.vel_pub.publish(vel_cmd)
+        with tracing.span('publish', 'topic') as span:
+            self.vel_pub.publish(vel_cmd)
+        timings['publish'] = span.duration
 
         # Wait for the next image for  the camera feed of the robot
-        data = None
-        while data is None:
+        with tracing.span('image_wait', 'topic') as span:
+            data = None
+            while data is None:
+                try:
+                    data = rospy.wait_for_message('/pi_camera/image_raw', Image,
+                                                  timeout=5)
+                except:
+                    pass
+        timings['image_wait'] = span.duration
+
+        with tracing.span('pause', 'service') as span:
+            rospy.wait_for_service('/gazebo/pause_physics')
             try:
-                data = rospy.wait_for_message('/pi_camera/image_raw', Image,
-                                              timeout=5)
-            except:
-                pass
-
-        rospy.wait_for_service('/gazebo/pause_physics')
-        try:
-            # resp_pause = pause.call()
-            self.pause()
-        except (rospy.ServiceException) as e:
-            print ("/gazebo/pause_physics service call failed")
+                # resp_pause = pause.call()
+                self.pause()
+            except (rospy.ServiceException) as e:
+                print ("/gazebo/pause_physics service call failed")
+        timings['pause'] = span.duration
 
         #Process the image after the action was taken
-        state, done = self.process_image(data)
+        with tracing.span('process_image', 'image') as span:
+            state, done = self.process_image(data)
+        timings['process_image'] = span.duration
 
         # Set the rewards for your action. These can be changed to tune the learning of the robot (sometimes track dependant)
         if not done:
@@ -171,9 +239,11 @@ class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
         else:
             reward = -200
 
-        return state, reward, done, {}
+        return self.observation(state), reward, done, {'centroid': self.centroid, 'phase_timings': timings}
 
     ## The reset function resets the robot (usually when its camera is off track)
+    #  The centroid of the first image is left in the centroid attribute (None when no line is detected),
+    #  so the first step of an episode can be encoded like the ones returned in info['centroid']
     def reset(self):
 
         print("Episode history: {}".format(self.episode_history))
@@ -181,38 +251,43 @@ class Gazebo_Lab06_Env(gazebo_env.GazeboEnv):
         print("Resetting simulation...")
         # Resets the state of the environment and returns an initial
         # observation.
-        rospy.wait_for_service('/gazebo/reset_simulation')
-        try:
-            # reset_proxy.call()
-            self.reset_proxy()
-        except (rospy.ServiceException) as e:
-            print ("/gazebo/reset_simulation service call failed")
+        with tracing.span('reset_simulation', 'service'):
+            rospy.wait_for_service('/gazebo/reset_simulation')
+            try:
+                # reset_proxy.call()
+                self.reset_proxy()
+            except (rospy.ServiceException) as e:
+                print ("/gazebo/reset_simulation service call failed")
 
         # Unpause simulation to make observation
-        rospy.wait_for_service('/gazebo/unpause_physics')
-        try:
-            # resp_pause = pause.call()
-            self.unpause()
-        except (rospy.ServiceException) as e:
-            print ("/gazebo/unpause_physics service call failed")
+        with tracing.span('unpause', 'service'):
+            rospy.wait_for_service('/gazebo/unpause_physics')
+            try:
+                # resp_pause = pause.call()
+                self.unpause()
+            except (rospy.ServiceException) as e:
+                print ("/gazebo/unpause_physics service call failed")
 
         # read image data
-        data = None
-        while data is None:
+        with tracing.span('image_wait', 'topic'):
+            data = None
+            while data is None:
+                try:
+                    data = rospy.wait_for_message('/pi_camera/image_raw',
+                                                  Image, timeout=5)
+                except:
+                    pass
+
+        with tracing.span('pause', 'service'):
+            rospy.wait_for_service('/gazebo/pause_physics')
             try:
-                data = rospy.wait_for_message('/pi_camera/image_raw',
-                                              Image, timeout=5)
-            except:
-                pass
-
-        rospy.wait_for_service('/gazebo/pause_physics')
-        try:
-            # resp_pause = pause.call()
-            self.pause()
-        except (rospy.ServiceException) as e:
-            print ("/gazebo/pause_physics service call failed")
+                # resp_pause = pause.call()
+                self.pause()
+            except (rospy.ServiceException) as e:
+                print ("/gazebo/pause_physics service call failed")
 
         self.timeout = 0
-        state, done = self.process_image(data)
+        with tracing.span('process_image', 'image'):
+            state, done = self.process_image(data)
 
-        return state
+        return self.observation(state)
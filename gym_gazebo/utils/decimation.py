@@ -0,0 +1,62 @@
+"""Bounded-size summaries of growing series, for plotting long runs."""
+
+import numpy as np
+
+class DecimatedSeries(object):
+    """Keeps a growing series as at most max_points buckets of consecutive values.
+
+    Each bucket holds the min, max and sum of bucket_size values (only the last
+    one may be partial). New values are folded into the buckets as they arrive;
+    when there are more than max_points buckets, neighbouring pairs are merged
+    and the bucket size doubles. Appending costs O(new values), plus
+    O(max_points) on the rare merges, however long the series gets.
+    """
+    def __init__(self, max_points=2000):
+        self.max_points = max_points
+        self.bucket_size = 1
+        self.count = 0
+        self.mins = np.zeros(0)
+        self.maxs = np.zeros(0)
+        self.sums = np.zeros(0)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.count += len(values)
+        if len(values) and len(self.counts) and self.counts[-1] < self.bucket_size:
+            # Top up the partial last bucket
+            chunk = values[:self.bucket_size - self.counts[-1]]
+            self.mins[-1] = min(self.mins[-1], chunk.min())
+            self.maxs[-1] = max(self.maxs[-1], chunk.max())
+            self.sums[-1] += chunk.sum()
+            self.counts[-1] += len(chunk)
+            values = values[len(chunk):]
+        if len(values):
+            buckets = -(-len(values) // self.bucket_size)
+            padded = np.full(buckets * self.bucket_size, np.nan)
+            padded[:len(values)] = values
+            padded = padded.reshape(buckets, self.bucket_size)
+            counts = np.full(buckets, self.bucket_size, dtype=np.int64)
+            counts[-1] = len(values) - (buckets - 1) * self.bucket_size
+            self.mins = np.concatenate((self.mins, np.nanmin(padded, axis=1)))
+            self.maxs = np.concatenate((self.maxs, np.nanmax(padded, axis=1)))
+            self.sums = np.concatenate((self.sums, np.nansum(padded, axis=1)))
+            self.counts = np.concatenate((self.counts, counts))
+        while len(self.counts) > self.max_points:
+            self._coarsen()
+
+    def _coarsen(self):
+        odd = len(self.counts) % 2
+        def pairs(values, combine):
+            merged = combine(values[:len(values) - odd:2], values[1:len(values) - odd:2])
+            return np.concatenate((merged, values[len(values) - odd:]))
+        self.mins = pairs(self.mins, np.minimum)
+        self.maxs = pairs(self.maxs, np.maximum)
+        self.sums = pairs(self.sums, np.add)
+        self.counts = pairs(self.counts, np.add)
+        self.bucket_size *= 2
+
+    def points(self):
+        """Returns (x, means, mins, maxs), x being the centre index of every bucket."""
+        x = np.arange(len(self.counts)) * self.bucket_size + (self.counts - 1) / 2.0
+        return x, self.sums / np.maximum(self.counts, 1), self.mins, self.maxs
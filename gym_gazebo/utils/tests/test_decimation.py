@@ -0,0 +1,43 @@
+import numpy as np
+
+from gym_gazebo.utils.decimation import DecimatedSeries
+
+def test_short_series_is_kept_whole():
+    series = DecimatedSeries(max_points=8)
+    series.extend([3.0, 1.0])
+    series.extend([2.0])
+    x, means, mins, maxs = series.points()
+    assert series.bucket_size == 1
+    assert x.tolist() == [0, 1, 2]
+    assert means.tolist() == mins.tolist() == maxs.tolist() == [3.0, 1.0, 2.0]
+
+def test_buckets_merge_in_pairs():
+    series = DecimatedSeries(max_points=4)
+    series.extend([1.0, 5.0, 2.0, 2.0, 0.0])
+    # Five points do not fit in four buckets: pairs merge and the odd one out is left partial
+    assert series.bucket_size == 2
+    assert series.counts.tolist() == [2, 2, 1]
+    x, means, mins, maxs = series.points()
+    assert x.tolist() == [0.5, 2.5, 4.0]
+    assert means.tolist() == [3.0, 2.0, 0.0]
+    assert mins.tolist() == [1.0, 2.0, 0.0]
+    assert maxs.tolist() == [5.0, 2.0, 0.0]
+
+    # New values top up the partial bucket first
+    series.extend([4.0])
+    assert series.counts.tolist() == [2, 2, 2]
+    assert series.points()[1].tolist() == [3.0, 2.0, 2.0]
+
+def test_incremental_extend_matches_bucketing_everything_at_once():
+    values = np.random.RandomState(0).randn(1000)
+    series = DecimatedSeries(max_points=50)
+    for chunk in np.array_split(values, 37):
+        series.extend(chunk)
+    size = series.bucket_size
+    assert series.count == len(values)
+    assert len(series.counts) <= 50
+    x, means, mins, maxs = series.points()
+    for i in range(len(x)):
+        bucket = values[i * size:(i + 1) * size]
+        assert np.isclose(means[i], bucket.mean())
+        assert mins[i] == bucket.min() and maxs[i] == bucket.max()
@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from gym_gazebo.utils import tracing
+
+def test_disabled_tracer_records_nothing():
+    tracer = tracing.Tracer(capacity=8)
+    with tracer.span('step') as span:
+        pass
+    assert span.duration >= 0
+    assert len(tracer) == 0
+    assert tracer.events() == []
+    # Nothing is allocated until tracing is enabled
+    assert tracer._starts is None
+    tracer.enable()
+    assert len(tracer._starts) == 8
+
+def test_spans_are_exported_as_chrome_trace():
+    tracer = tracing.Tracer(capacity=8)
+    tracer.enable()
+    with tracer.span('unpause', 'service'):
+        pass
+    with tracer.span('image_wait', 'topic'):
+        pass
+
+    events = [event for event in tracer.events() if event['ph'] == 'X']
+    assert [event['name'] for event in events] == ['unpause', 'image_wait']
+    assert [event['cat'] for event in events] == ['service', 'topic']
+    assert events[0]['ts'] <= events[1]['ts']
+    assert all(event['dur'] >= 0 for event in events)
+
+    temp = tempfile.mkdtemp()
+    try:
+        path = tracer.dump(os.path.join(temp, 'trace.json'))
+        with open(path) as f:
+            trace = json.load(f)
+        assert len([event for event in trace['traceEvents'] if event['ph'] == 'X']) == 2
+    finally:
+        shutil.rmtree(temp)
+
+def test_ring_buffer_keeps_latest_spans():
+    tracer = tracing.Tracer(capacity=4)
+    tracer.enable()
+    for i in range(10):
+        with tracer.span('span{}'.format(i)):
+            pass
+    assert len(tracer) == 4
+    names = [event['name'] for event in tracer.events() if event['ph'] == 'X']
+    assert names == ['span6', 'span7', 'span8', 'span9']
+
+def test_spans_from_threads():
+    tracer = tracing.Tracer(capacity=64)
+    tracer.enable()
+
+    @tracer.traced('work')
+    def work():
+        pass
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    events = tracer.events()
+    spans = [event for event in events if event['ph'] == 'X']
+    named_threads = set(event['tid'] for event in events if event['ph'] == 'M')
+    assert len(spans) == 4
+    assert all(event['tid'] in named_threads for event in spans)
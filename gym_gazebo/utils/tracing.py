@@ -0,0 +1,179 @@
+"""Opt-in span tracer with Chrome trace (chrome://tracing, Perfetto) export.
+
+Code marks the operations worth seeing on a timeline with
+
+    with tracing.span('unpause', 'service'):
+        ...
+
+Tracing is off until enable() is called (or the GYM_GAZEBO_TRACE environment
+variable names a file to dump to at exit); a span then costs little more than
+two clock reads. The first enable() allocates a ring buffer for the finished
+spans, so memory stays fixed and only the most recent `capacity` spans are
+kept; a tracer that is never enabled allocates nothing. dump() writes them as
+Chrome trace JSON.
+"""
+
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_CAPACITY = 1 << 16
+
+class Span(object):
+    """Times a block of code, and records it if the tracer is enabled.
+
+    After the block, `duration` holds the seconds it took, whether or not
+    tracing is enabled, so callers can reuse the measurement.
+    """
+    __slots__ = ('tracer', 'name', 'category', 'start', 'duration')
+
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.start = None
+        self.duration = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self.start
+        if self.tracer.enabled:
+            self.tracer.record(self.name, self.category, self.start, self.duration)
+        return False
+
+class Tracer(object):
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.capacity = capacity
+        # The buffers are allocated by the first enable()
+        self._starts = None
+        self._thread_names = {}
+        self._recorded = 0
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self._starts = np.zeros(capacity, dtype=np.float64)
+        self._durations = np.zeros(capacity, dtype=np.float64)
+        self._names = np.zeros(capacity, dtype=np.int32)
+        self._categories = np.zeros(capacity, dtype=np.int32)
+        self._threads = np.zeros(capacity, dtype=np.int64)
+        self._strings = []
+        self._string_ids = {}
+        self._thread_names = {}
+        # next() on an itertools.count is atomic, so threads claim distinct slots without a lock
+        self._slots = itertools.count()
+        self._recorded = 0
+
+    def enable(self, capacity=None):
+        """Starts recording spans, allocating the buffer on first use or for a new capacity."""
+        with self._lock:
+            if self._starts is None or (capacity is not None and capacity != self.capacity):
+                self._allocate(self.capacity if capacity is None else capacity)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            if self._starts is not None:
+                self._allocate(self.capacity)
+
+    def span(self, name, category='gazebo'):
+        return Span(self, name, category)
+
+    def traced(self, name=None, category='gazebo'):
+        """Decorator recording every call of the function as a span."""
+        def decorator(function):
+            span_name = name or function.__name__
+            def wrapper(*args, **kwargs):
+                with Span(self, span_name, category):
+                    return function(*args, **kwargs)
+            wrapper.__name__ = function.__name__
+            wrapper.__doc__ = function.__doc__
+            return wrapper
+        return decorator
+
+    def _intern(self, string):
+        string_id = self._string_ids.get(string)
+        if string_id is None:
+            with self._lock:
+                string_id = self._string_ids.get(string)
+                if string_id is None:
+                    string_id = len(self._strings)
+                    self._strings.append(string)
+                    self._string_ids[string] = string_id
+        return string_id
+
+    def record(self, name, category, start, duration):
+        thread = threading.current_thread()
+        if thread.ident not in self._thread_names:
+            self._thread_names[thread.ident] = thread.name
+        slot = next(self._slots)
+        index = slot % self.capacity
+        self._starts[index] = start
+        self._durations[index] = duration
+        self._names[index] = self._intern(name)
+        self._categories[index] = self._intern(category)
+        self._threads[index] = thread.ident
+        self._recorded = max(self._recorded, slot + 1)
+
+    def __len__(self):
+        return min(self._recorded, self.capacity)
+
+    def events(self):
+        """Returns the recorded spans as Chrome trace events, oldest first."""
+        count = len(self)
+        order = np.argsort(self._starts[:count], kind='mergesort') if count else ()
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': ident, 'args': {'name': name}}
+                  for ident, name in self._thread_names.items()]
+        for index in order:
+            events.append({
+                'name': self._strings[self._names[index]],
+                'cat': self._strings[self._categories[index]],
+                'ph': 'X',
+                'pid': pid,
+                'tid': int(self._threads[index]),
+                'ts': self._starts[index] * 1e6,
+                'dur': self._durations[index] * 1e6,
+            })
+        return events
+
+    def dump(self, path):
+        """Writes the recorded spans to `path` as Chrome trace JSON."""
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events(), 'displayTimeUnit': 'ms'}, f)
+        return path
+
+tracer = Tracer()
+
+def span(name, category='gazebo'):
+    return tracer.span(name, category)
+
+def traced(name=None, category='gazebo'):
+    return tracer.traced(name, category)
+
+def enable(capacity=None, path=None):
+    """Enables the global tracer; with a path, the trace is dumped there at exit."""
+    tracer.enable(capacity)
+    if path is not None:
+        atexit.register(tracer.dump, path)
+
+def disable():
+    tracer.disable()
+
+def dump(path):
+    return tracer.dump(path)
+
+if os.environ.get('GYM_GAZEBO_TRACE'):
+    enable(path=os.environ['GYM_GAZEBO_TRACE'])
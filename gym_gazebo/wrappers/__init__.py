@@ -1,4 +1,4 @@
 from gym import error
-from gym.wrappers.monitor import Monitor
+from gym_gazebo.wrappers.monitor import Monitor
 from gym.wrappers.time_limit import TimeLimit
 from gym.wrappers.dict import FlattenDictWrapper
@@ -1,9 +1,11 @@
 import gym
 from gym import Wrapper
 from gym import error, version, logger
-import os, json, numpy as np, six
-from gym.wrappers.monitoring import stats_recorder, video_recorder
+import array, heapq, os, json, threading, time, numpy as np, six
+from six.moves import queue
+from gym_gazebo.wrappers.monitoring import latency_recorder, stats_index, stats_recorder, video_recorder
 from gym.utils import atomic_write, closer
+from gym_gazebo.utils import tracing
 from gym.utils.json_utils import json_encode_np
 
 FILE_PREFIX = 'openaigym'
@@ -11,12 +13,14 @@ MANIFEST_PREFIX = FILE_PREFIX + '.manifest'
 
 class Monitor(Wrapper):
     def __init__(self, env, directory, video_callable=None, force=False, resume=False,
-                 write_upon_reset=False, uid=None, mode=None):
+                 write_upon_reset=False, uid=None, mode=None, flush_every_episodes=None,
+                 flush_every_seconds=None, max_pending_flushes=16):
         super(Monitor, self).__init__(env)
 
         self.videos = []
 
         self.stats_recorder = None
+        self.latency_recorder = None
         self.video_recorder = None
         self.enabled = False
         self.episode_id = 0
@@ -24,18 +28,23 @@ class Monitor(Wrapper):
         self.env_semantics_autoreset = env.metadata.get('semantics.autoreset')
 
         self._start(directory, video_callable, force, resume,
-                            write_upon_reset, uid, mode)
+                            write_upon_reset, uid, mode, flush_every_episodes,
+                            flush_every_seconds, max_pending_flushes)
 
     def step(self, action):
         self._before_step(action)
-        observation, reward, done, info = self.env.step(action)
+        with tracing.span('step', 'monitor') as span:
+            observation, reward, done, info = self.env.step(action)
+        if self.enabled:
+            self.latency_recorder.record_step(span.duration, info.get('phase_timings') if info else None)
         done = self._after_step(observation, reward, done, info)
 
         return observation, reward, done, info
 
     def reset(self, **kwargs):
         self._before_reset()
-        observation = self.env.reset(**kwargs)
+        with tracing.span('reset', 'monitor'):
+            observation = self.env.reset(**kwargs)
         self._after_reset(observation)
 
         return observation
@@ -53,7 +62,8 @@ class Monitor(Wrapper):
 
 
     def _start(self, directory, video_callable=None, force=False, resume=False,
-              write_upon_reset=False, uid=None, mode=None):
+              write_upon_reset=False, uid=None, mode=None, flush_every_episodes=None,
+              flush_every_seconds=None, max_pending_flushes=16):
         """Start monitoring.
 
         Args:
@@ -64,6 +74,11 @@ class Monitor(Wrapper):
             write_upon_reset (bool): Write the manifest file on each reset. (This is currently a JSON file, so writing it is somewhat expensive.)
             uid (Optional[str]): A unique id used as part of the suffix for the file. By default, uses os.getpid().
             mode (['evaluation', 'training']): Whether this is an evaluation or training episode.
+            flush_every_episodes (Optional[int]): Write the stats and manifest on reset once this many episodes have completed since the last write.
+            flush_every_seconds (Optional[float]): Write the stats and manifest on reset once this many seconds have passed since the last write.
+            max_pending_flushes (int): Writes that may wait for the background writer thread before a flush blocks.
+
+        Without write_upon_reset or a flush interval, monitor files are only written on close and on _flush(force=True).
         """
         if self.env.spec is None:
             logger.warn("Trying to monitor an environment which has no 'spec' set. This usually means you did not create it via 'gym.make', and is recommended only for advanced users.")
@@ -106,44 +121,85 @@ class Monitor(Wrapper):
         self.file_infix = '{}.{}'.format(self._monitor_id, uid if uid else os.getpid())
 
         self.stats_recorder = stats_recorder.StatsRecorder(directory, '{}.episode_batch.{}'.format(self.file_prefix, self.file_infix), autoreset=self.env_semantics_autoreset, env_id=env_id)
+        self.latency_recorder = latency_recorder.LatencyRecorder(directory, '{}.episode_batch.{}'.format(self.file_prefix, self.file_infix))
 
         if not os.path.exists(directory): os.mkdir(directory)
         self.write_upon_reset = write_upon_reset
+        self.flush_every_episodes = flush_every_episodes
+        self.flush_every_seconds = flush_every_seconds
+        self._last_flush_episodes = 0
+        self._last_flush_time = time.time()
+        self._writer = BackgroundWriter(max_pending_flushes)
 
         if mode is not None:
             self._set_mode(mode)
 
     def _flush(self, force=False):
-        """Flush all relevant monitor information to disk."""
-        if not self.write_upon_reset and not force:
-            return
+        """Flush all relevant monitor information to disk.
 
-        self.stats_recorder.flush()
+        Unless force is set, nothing is written until the flush policy says a
+        write is due. The new stats and the manifest are captured here and
+        written by a background thread; with force=True this call also waits
+        until they, and every earlier write, are synced to disk.
+        """
+        if not force and not self._flush_due():
+            return
+        self._last_flush_episodes = len(self.stats_recorder.episode_lengths)
+        self._last_flush_time = time.time()
 
+        lines = self.stats_recorder._take_pending()
+        latencies = self.latency_recorder.snapshot()
         # Give it a very distiguished name, since we need to pick it
         # up from the filesystem later.
         path = os.path.join(self.directory, '{}.manifest.{}.manifest.json'.format(self.file_prefix, self.file_infix))
-        logger.debug('Writing training manifest file to %s', path)
-        with atomic_write.atomic_write(path) as f:
-            # We need to write relative paths here since people may
-            # move the training_dir around. It would be cleaner to
-            # already have the basenames rather than basename'ing
-            # manually, but this works for now.
-            json.dump({
-                'stats': os.path.basename(self.stats_recorder.path),
-                'videos': [(os.path.basename(v), os.path.basename(m))
-                           for v, m in self.videos],
-                'env_info': self._env_info(),
-            }, f, default=json_encode_np)
+        # We need to write relative paths here since people may
+        # move the training_dir around. It would be cleaner to
+        # already have the basenames rather than basename'ing
+        # manually, but this works for now.
+        manifest = {
+            'stats': os.path.basename(self.stats_recorder.path),
+            'latency': os.path.basename(self.latency_recorder.path),
+            'videos': [(os.path.basename(v), os.path.basename(m))
+                       for v, m in self.videos],
+            'env_info': self._env_info(),
+        }
+
+        def write():
+            with tracing.span('flush_write', 'monitor'):
+                self.stats_recorder._write(lines, fsync=force)
+                latency_recorder.write_latency_file(self.latency_recorder.path, latencies, fsync=force)
+                logger.debug('Writing training manifest file to %s', path)
+                with atomic_write.atomic_write(path, fsync=force) as f:
+                    json.dump(manifest, f, default=json_encode_np)
+
+        with tracing.span('flush', 'monitor'):
+            self._writer.submit(write)
+            if force:
+                self._writer.barrier()
+
+    def _flush_due(self):
+        if self.write_upon_reset:
+            return True
+        completed = len(self.stats_recorder.episode_lengths)
+        if self.flush_every_episodes is not None and completed - self._last_flush_episodes >= self.flush_every_episodes:
+            return True
+        if self.flush_every_seconds is not None and time.time() - self._last_flush_time >= self.flush_every_seconds:
+            return True
+        return False
 
     def close(self):
         """Flush all monitor data to disk and close any open rending windows."""
         if not self.enabled:
             return
-        self.stats_recorder.close()
         if self.video_recorder is not None:
             self._close_video_recorder()
         self._flush(force=True)
+        self._writer.close()
+        # Everything was written by the final flush
+        self.stats_recorder.close()
+        for phase, summary in sorted(self.get_latency_summary().items()):
+            logger.info('Latency of %s over %d calls: p50 %.2fms, p90 %.2fms, p99 %.2fms, max %.2fms', phase, summary['count'],
+                        1000 * summary['p50'], 1000 * summary['p90'], 1000 * summary['p99'], 1000 * summary['max'])
 
         # Stop tracking this for autoclose
         monitor_closer.unregister(self._monitor_id)
@@ -242,10 +298,74 @@ class Monitor(Wrapper):
     def get_episode_lengths(self):
         return self.stats_recorder.episode_lengths
 
+    def get_latency_summary(self, percentiles=(50, 90, 99)):
+        """Per-phase latency summaries in seconds: count, mean, min, max and the given percentiles.
+
+        The 'step' phase is the wall time of env.step; the others come from the
+        'phase_timings' dict the environment returns in its step info.
+        """
+        return self.latency_recorder.summary(percentiles)
+
+    def get_reward_stats(self):
+        """Running aggregates of the episode rewards (a stats_recorder.RunningStats)."""
+        return self.stats_recorder.reward_stats
+
+    def get_length_stats(self):
+        """Running aggregates of the episode lengths (a stats_recorder.RunningStats)."""
+        return self.stats_recorder.length_stats
+
+class BackgroundWriter(object):
+    """Runs write callables in order on a daemon thread.
+
+    submit blocks once max_pending writes are waiting, so a slow disk slows
+    the caller down instead of growing the queue. An exception raised by a
+    write is re-raised by the next submit, barrier or close call.
+    """
+    def __init__(self, max_pending=16):
+        self._queue = queue.Queue(max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='MonitorWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, write):
+        self._raise_error()
+        self._queue.put(write)
+
+    def barrier(self):
+        """Waits until every submitted write has run."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            e, self._error = self._error, None
+            raise e
+
+    def _run(self):
+        while True:
+            write = self._queue.get()
+            try:
+                if write is None:
+                    return
+                write()
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
 def detect_training_manifests(training_dir, files=None):
     if files is None:
         files = os.listdir(training_dir)
-    return [os.path.join(training_dir, f) for f in files if f.startswith(MANIFEST_PREFIX + '.')]
+    # The suffix check skips the temp files of manifests still being written
+    return [os.path.join(training_dir, f) for f in files
+            if f.startswith(MANIFEST_PREFIX + '.') and f.endswith('.manifest.json')]
 
 def detect_monitor_files(training_dir):
     return [os.path.join(training_dir, f) for f in os.listdir(training_dir) if f.startswith(FILE_PREFIX + '.')]
@@ -285,7 +405,14 @@ def load_env_info_from_manifests(manifests, training_dir):
     env_info = collapse_env_infos(env_infos, training_dir)
     return env_info
 
-def load_results(training_dir):
+def load_results(training_dir, start=None, end=None, columns=None, use_index=False):
+    """Loads the monitor results of a training directory.
+
+    start, end and columns restrict the episodes and columns loaded, as in
+    load_stats_columns. With use_index, the episodes are read through the
+    stats_index.StatsIndex cache kept in the directory, which only parses what
+    changed since the previous load.
+    """
     if not os.path.exists(training_dir):
         logger.error('Training directory %s not found', training_dir)
         return
@@ -312,7 +439,13 @@ def load_results(training_dir):
             env_infos.append(contents['env_info'])
 
     env_info = collapse_env_infos(env_infos, training_dir)
-    data_sources, initial_reset_timestamps, timestamps, episode_lengths, episode_rewards, episode_types, initial_reset_timestamp = merge_stats_files(stats_files)
+    if use_index:
+        if columns is not None:
+            _check_columns(columns)
+        stats = stats_index.StatsIndex(training_dir).load(stats_files, start, end, columns)
+        data_sources, initial_reset_timestamps, timestamps, episode_lengths, episode_rewards, episode_types, initial_reset_timestamp = _stats_tuple(stats)
+    else:
+        data_sources, initial_reset_timestamps, timestamps, episode_lengths, episode_rewards, episode_types, initial_reset_timestamp = merge_stats_files(stats_files, start, end, columns)
 
     return {
         'manifests': manifests,
@@ -327,44 +460,116 @@ def load_results(training_dir):
         'videos': videos,
     }
 
-def merge_stats_files(stats_files):
-    timestamps = []
-    episode_lengths = []
-    episode_rewards = []
-    episode_types = []
-    initial_reset_timestamps = []
-    data_sources = []
+STATS_COLUMNS = ('timestamps', 'episode_lengths', 'episode_rewards', 'episode_types', 'data_sources')
+
+def load_stats_columns(stats_files, start=None, end=None, columns=None):
+    """Merges per-worker stats files into columnar arrays sorted by timestamp.
+
+    Every file is already in time order, so the files are streamed and k-way
+    merged with a heap instead of being loaded whole and sorted: memory holds
+    a block of lines per file plus the selected output columns, and the
+    columns not selected are never accumulated.
+
+    Args:
+        stats_files (list): Paths of episode logs or .stats.json files.
+        start (Optional[float]): Only keep episodes that ended at or after this timestamp.
+        end (Optional[float]): Only keep episodes that ended before this timestamp.
+        columns (Optional[list]): Subset of STATS_COLUMNS to load; the others are None.
+
+    Returns:
+        dict: The selected columns as NumPy arrays ('episode_types' is a
+        fixed-width string array holding stats_recorder.MISSING_TYPE for
+        episodes without a type, or None when no episode has one;
+        'data_sources' indexes stats_files), plus
+        'initial_reset_timestamps' for every file contributing episodes and
+        their minimum 'initial_reset_timestamp' (0 when there is none).
+    """
+    if columns is None:
+        columns = STATS_COLUMNS
+    _check_columns(columns)
 
+    initial_reset_timestamps = []
+    streams = []
     for i, path in enumerate(stats_files):
-        with open(path) as f:
-            content = json.load(f)
-            if len(content['timestamps'])==0: continue # so empty file doesn't mess up results, due to null initial_reset_timestamp
-            data_sources += [i] * len(content['timestamps'])
-            timestamps += content['timestamps']
-            episode_lengths += content['episode_lengths']
-            episode_rewards += content['episode_rewards']
-            # Recent addition
-            episode_types += content.get('episode_types', [])
-            # Keep track of where each episode came from.
-            initial_reset_timestamps.append(content['initial_reset_timestamp'])
-
-    idxs = np.argsort(timestamps)
-    timestamps = np.array(timestamps)[idxs].tolist()
-    episode_lengths = np.array(episode_lengths)[idxs].tolist()
-    episode_rewards = np.array(episode_rewards)[idxs].tolist()
-    data_sources = np.array(data_sources)[idxs].tolist()
-
-    if episode_types:
-        episode_types = np.array(episode_types)[idxs].tolist()
-    else:
-        episode_types = None
+        initial_reset_timestamp, episodes = stats_recorder.read_stats(path)
+        initial_reset_timestamps.append(initial_reset_timestamp)
+        streams.append(_windowed_episodes(episodes, i, start, end))
+
+    # Accumulators are only created for the requested columns; array.array
+    # grows without boxing every value into a Python object
+    values = dict((column, array.array(typecode)) for column, _, typecode in _MERGE_FIELDS if column in columns)
+    # Episode types are stored as codes into the distinct types seen
+    type_codes = {}
+    def append_type(type):
+        code = type_codes.get(type)
+        if code is None:
+            code = type_codes[type] = len(type_codes)
+        values['episode_types'].append(code)
+    appends = [(append_type if column == 'episode_types' else values[column].append, field)
+               for column, field, _ in _MERGE_FIELDS if column in values]
+
+    counts = [0] * len(stats_files)
+    for episode in heapq.merge(*streams):
+        counts[episode[1]] += 1
+        for append, field in appends:
+            append(episode[field])
+
+    results = {}
+    for column, _, typecode in _MERGE_FIELDS:
+        if column not in values:
+            results[column] = None
+        elif column == 'episode_types':
+            results[column] = _decode_types(values[column], type_codes)
+        else:
+            results[column] = np.frombuffer(values[column], dtype=np.float64 if typecode == 'd' else np.int64).copy()
+
+    # Files without episodes have no meaningful initial reset timestamp
+    results['initial_reset_timestamps'] = [t for t, count in zip(initial_reset_timestamps, counts) if count > 0]
+    results['initial_reset_timestamp'] = min(results['initial_reset_timestamps']) if results['initial_reset_timestamps'] else 0
+    return results
+
+# (column, field of the merged episode tuples, array.array typecode)
+_MERGE_FIELDS = (
+    ('timestamps', 0, 'd'),
+    ('data_sources', 1, 'q'),
+    ('episode_lengths', 2, 'q'),
+    ('episode_rewards', 3, 'd'),
+    ('episode_types', 4, 'q'),
+)
+
+def _decode_types(codes, type_codes):
+    """Turns type codes into a fixed-width string array (MISSING_TYPE for a missing type), or None if no episode has a type."""
+    if not any(type_codes):
+        return None
+    names = [stats_recorder.MISSING_TYPE] * len(type_codes)
+    for type, code in type_codes.items():
+        names[code] = type or stats_recorder.MISSING_TYPE
+    return np.array(names)[np.frombuffer(codes, dtype=np.int64)]
+
+def _check_columns(columns):
+    for column in columns:
+        if column not in STATS_COLUMNS:
+            raise error.Error('Unknown stats column {}: must be one of {}'.format(column, ', '.join(STATS_COLUMNS)))
+
+def _windowed_episodes(episodes, source, start, end):
+    # Yields (timestamp, source, length, reward, type) so ties are broken by file order
+    for timestamp, length, reward, type in episodes:
+        if start is not None and timestamp < start:
+            continue
+        if end is not None and timestamp >= end:
+            return
+        yield timestamp, source, length, reward, type
 
-    if len(initial_reset_timestamps) > 0:
-        initial_reset_timestamp = min(initial_reset_timestamps)
-    else:
-        initial_reset_timestamp = 0
+def merge_stats_files(stats_files, start=None, end=None, columns=None):
+    return _stats_tuple(load_stats_columns(stats_files, start, end, columns))
+
+def _stats_tuple(results):
+    def tolist(column):
+        return None if results[column] is None else results[column].tolist()
 
-    return data_sources, initial_reset_timestamps, timestamps, episode_lengths, episode_rewards, episode_types, initial_reset_timestamp
+    return (tolist('data_sources'), results['initial_reset_timestamps'], tolist('timestamps'),
+            tolist('episode_lengths'), tolist('episode_rewards'), tolist('episode_types'),
+            results['initial_reset_timestamp'])
 
 # TODO training_dir isn't used except for error messages, clean up the layering
 def collapse_env_infos(env_infos, training_dir):
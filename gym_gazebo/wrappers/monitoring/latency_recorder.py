@@ -0,0 +1,131 @@
+import json
+import math
+import os
+
+from gym.utils import atomic_write
+
+# Buckets are spaced logarithmically from MIN_LATENCY up to MAX_LATENCY seconds,
+# BUCKETS_PER_DECADE per factor of ten (each about 12% wide). Two extra buckets
+# catch the values below and above that range.
+MIN_LATENCY = 1e-6
+MAX_LATENCY = 100.0
+BUCKETS_PER_DECADE = 20
+NUM_BUCKETS = int(round(math.log10(MAX_LATENCY / MIN_LATENCY) * BUCKETS_PER_DECADE)) + 2
+
+STEP_PHASE = 'step'
+
+def bucket_upper_bound(index):
+    """Upper edge, in seconds, of bucket `index` (infinite for the overflow bucket)."""
+    if index >= NUM_BUCKETS - 1:
+        return float('inf')
+    return MIN_LATENCY * 10 ** (index / float(BUCKETS_PER_DECADE))
+
+class LatencyHistogram(object):
+    """Fixed-bucket histogram of durations in seconds.
+
+    Recording is O(1) and the memory used does not depend on the number of
+    samples. Percentiles are resolved to the upper edge of their bucket, so
+    they overestimate by at most one bucket width.
+    """
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        if seconds < MIN_LATENCY:
+            index = 0
+        else:
+            index = min(int(math.ceil(math.log10(seconds / MIN_LATENCY) * BUCKETS_PER_DECADE)), NUM_BUCKETS - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, q):
+        """Returns the q-th percentile (0 <= q <= 100), or None without samples."""
+        if self.count == 0:
+            return None
+        rank = max(1, int(math.ceil(q / 100.0 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # Never report beyond the largest value actually seen
+                return min(bucket_upper_bound(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self, percentiles=(50, 90, 99)):
+        summary = {'count': self.count, 'mean': self.mean(), 'min': self.min, 'max': self.max}
+        for q in percentiles:
+            summary['p{}'.format(q)] = self.percentile(q)
+        return summary
+
+    def to_dict(self):
+        return {'counts': list(self.counts), 'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = list(data['counts'])
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+class LatencyRecorder(object):
+    """Per-phase latency histograms of the steps of a monitored environment.
+
+    The wall time of every env.step is recorded under the 'step' phase.
+    Environments can report finer timings by returning, in the step info, a
+    'phase_timings' dict of phase name to seconds; each phase gets its own
+    histogram. The histograms are written to <file_prefix>.latency.json next
+    to the stats file, and summarized with percentiles on close.
+    """
+    def __init__(self, directory, file_prefix):
+        self.directory = directory
+        self.path = os.path.join(directory, '{}.latency.json'.format(file_prefix))
+        self.histograms = {}
+
+    def record(self, phase, seconds):
+        histogram = self.histograms.get(phase)
+        if histogram is None:
+            histogram = self.histograms[phase] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def record_step(self, seconds, phase_timings=None):
+        self.record(STEP_PHASE, seconds)
+        if phase_timings:
+            for phase, phase_seconds in phase_timings.items():
+                self.record(phase, phase_seconds)
+
+    def snapshot(self):
+        """Returns the JSON-serializable contents of the latency file."""
+        return {
+            'min_latency': MIN_LATENCY,
+            'buckets_per_decade': BUCKETS_PER_DECADE,
+            'phases': dict((phase, histogram.to_dict()) for phase, histogram in self.histograms.items()),
+        }
+
+    def summary(self, percentiles=(50, 90, 99)):
+        return dict((phase, histogram.summary(percentiles)) for phase, histogram in self.histograms.items())
+
+    def flush(self):
+        write_latency_file(self.path, self.snapshot())
+
+def write_latency_file(path, snapshot, fsync=False):
+    with atomic_write.atomic_write(path, fsync=fsync) as f:
+        json.dump(snapshot, f)
+
+def load_latency_file(path):
+    """Returns the {phase: LatencyHistogram} saved in a latency file."""
+    with open(path) as f:
+        content = json.load(f)
+    return dict((phase, LatencyHistogram.from_dict(data)) for phase, data in content['phases'].items())
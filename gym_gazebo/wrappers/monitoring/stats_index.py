@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+
+from gym.utils import atomic_write
+from gym_gazebo.wrappers.monitoring import stats_recorder
+
+# Starts with the monitor file prefix so clear_monitor_files removes it too
+INDEX_FILENAME = 'openaigym.index.npz'
+INDEX_VERSION = 2
+
+# Bytes from the start of a log kept to detect a file replaced by a new one
+HEAD_SIZE = 256
+
+COLUMN_DTYPES = (
+    ('timestamps', np.float64),
+    ('episode_lengths', np.int64),
+    ('episode_rewards', np.float64),
+    # Width inferred from the longest type
+    ('episode_types', 'U'),
+)
+
+class StatsIndex(object):
+    """Sidecar cache of the episode columns of a training directory.
+
+    The index is an .npz file holding, for every stats file it has read, that
+    file's episodes as NumPy columns along with the file's size and mtime.
+    On load, files whose size and mtime are unchanged are not read at all; an
+    episode log that only grew is parsed from where the index stopped; any
+    other file is parsed again. The index is rewritten (atomically) only when
+    something changed, so reloading a large, idle results directory costs one
+    .npz read and a sort.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILENAME)
+        self._sources = None
+
+    def load(self, stats_files, start=None, end=None, columns=None):
+        """Returns the same dict as monitor.load_stats_columns, updating the index first."""
+        if self._sources is None:
+            self._sources = self._read()
+        sources = {}
+        changed = False
+        for path in stats_files:
+            name = os.path.basename(path)
+            entry = self._update(path, self._sources.get(name))
+            changed = changed or entry is not self._sources.get(name)
+            sources[name] = entry
+        if changed or set(sources) != set(self._sources):
+            self._sources = sources
+            self._write()
+        return self._merge([sources[os.path.basename(path)] for path in stats_files], start, end, columns)
+
+    def _update(self, path, entry):
+        stat = os.stat(path)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry
+
+        is_log = path.endswith(stats_recorder.LOG_EXTENSION)
+        if is_log and entry is not None and stat.st_size > entry['size'] and self._head(path).startswith(entry['head']):
+            new = self._parse_log(path, entry['offset'])
+            new['initial_reset_timestamp'] = entry['initial_reset_timestamp'] if entry['initial_reset_timestamp'] is not None else new['initial_reset_timestamp']
+            for column, _ in COLUMN_DTYPES:
+                new[column] = np.concatenate((entry[column], new[column]))
+        elif is_log:
+            new = self._parse_log(path, 0)
+        else:
+            new = self._parse_json(path)
+        new['size'] = stat.st_size
+        new['mtime'] = stat.st_mtime
+        new['head'] = self._head(path)
+        return new
+
+    @staticmethod
+    def _head(path):
+        with open(path, 'rb') as f:
+            return f.read(HEAD_SIZE).decode('utf-8', 'replace')
+
+    @staticmethod
+    def _parse_log(path, offset):
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # Only complete lines are indexed; a line still being written is read next time
+        end = data.rfind(b'\n') + 1
+        initial_reset_timestamp = None
+        values = dict((column, []) for column, _ in COLUMN_DTYPES)
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except ValueError:
+                break
+            if 'initial_reset_timestamp' in record:
+                if initial_reset_timestamp is None:
+                    initial_reset_timestamp = record['initial_reset_timestamp']
+                continue
+            values['timestamps'].append(record['timestamp'])
+            values['episode_lengths'].append(record['episode_length'])
+            values['episode_rewards'].append(record['episode_reward'])
+            values['episode_types'].append(record['episode_type'] or stats_recorder.MISSING_TYPE)
+        entry = dict((column, np.array(values[column], dtype=dtype)) for column, dtype in COLUMN_DTYPES)
+        entry['initial_reset_timestamp'] = initial_reset_timestamp
+        entry['offset'] = offset + end
+        return entry
+
+    @staticmethod
+    def _parse_json(path):
+        content = stats_recorder.load_stats(path)
+        count = len(content['timestamps'])
+        types = (content.get('episode_types') or [])[:count]
+        types = [type or stats_recorder.MISSING_TYPE for type in types] + [stats_recorder.MISSING_TYPE] * (count - len(types))
+        entry = {
+            'timestamps': np.array(content['timestamps'], dtype=np.float64),
+            'episode_lengths': np.array(content['episode_lengths'], dtype=np.int64),
+            'episode_rewards': np.array(content['episode_rewards'], dtype=np.float64),
+            'episode_types': np.array(types, dtype='U'),
+            'initial_reset_timestamp': content['initial_reset_timestamp'],
+            'offset': 0,
+        }
+        return entry
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with np.load(self.path) as data:
+                meta = json.loads(str(data['meta']))
+                if meta['version'] != INDEX_VERSION:
+                    return {}
+                arrays = dict((column, data[column]) for column, _ in COLUMN_DTYPES)
+                sources = {}
+                position = 0
+                for source in meta['sources']:
+                    entry = dict(source)
+                    count = entry.pop('count')
+                    for column, _ in COLUMN_DTYPES:
+                        entry[column] = arrays[column][position:position + count]
+                    sources[entry.pop('name')] = entry
+                    position += count
+                return sources
+        except (IOError, OSError, ValueError, KeyError):
+            # A damaged or foreign index is rebuilt from the stats files
+            return {}
+
+    def _write(self):
+        names = sorted(self._sources)
+        meta = {'version': INDEX_VERSION, 'sources': []}
+        for name in names:
+            entry = self._sources[name]
+            meta['sources'].append({
+                'name': name,
+                'count': len(entry['timestamps']),
+                'size': entry['size'],
+                'mtime': entry['mtime'],
+                'head': entry['head'],
+                'offset': entry['offset'],
+                'initial_reset_timestamp': entry['initial_reset_timestamp'],
+            })
+        arrays = dict((column, np.concatenate([self._sources[name][column] for name in names]) if names else np.zeros(0, dtype))
+                      for column, dtype in COLUMN_DTYPES)
+        with atomic_write.atomic_write(self.path, binary=True) as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    @staticmethod
+    def _merge(entries, start, end, columns):
+        counts = [len(entry['timestamps']) for entry in entries]
+        merged = dict((column, np.concatenate([entry[column] for entry in entries]) if entries else np.zeros(0, dtype))
+                      for column, dtype in COLUMN_DTYPES)
+        merged['data_sources'] = np.repeat(np.arange(len(entries), dtype=np.int64), counts)
+
+        # Stable, so ties keep file order like the streaming merge
+        order = np.argsort(merged['timestamps'], kind='mergesort')
+        timestamps = merged['timestamps'][order]
+        if start is not None:
+            order = order[timestamps >= start]
+            timestamps = merged['timestamps'][order]
+        if end is not None:
+            order = order[timestamps < end]
+
+        results = {}
+        for column in ('timestamps', 'episode_lengths', 'episode_rewards', 'episode_types', 'data_sources'):
+            if columns is not None and column not in columns:
+                results[column] = None
+            else:
+                results[column] = merged[column][order]
+        if results['episode_types'] is not None and not (results['episode_types'] != stats_recorder.MISSING_TYPE).any():
+            results['episode_types'] = None
+
+        contributing = np.unique(merged['data_sources'][order])
+        results['initial_reset_timestamps'] = [entries[i]['initial_reset_timestamp'] for i in contributing]
+        results['initial_reset_timestamp'] = min(results['initial_reset_timestamps']) if results['initial_reset_timestamps'] else 0
+        return results
@@ -1,4 +1,6 @@
+import heapq
 import json
+import math
 import os
 import time
 
@@ -6,8 +8,123 @@ from gym import error
 from gym.utils import atomic_write
 from gym.utils.json_utils import json_encode_np
 
+# Episode records are appended one JSON object per line; the optional first
+# line holds the initial reset timestamp.
+LOG_EXTENSION = '.stats.jsonl'
+# Lines read from an episode log each time it is opened while streaming
+LOG_READ_LINES = 1024
+# How episode type columns loaded as arrays represent an episode without a type
+MISSING_TYPE = ''
+
+class RunningStats(object):
+    """Aggregates of a stream of values, updated in O(1) (O(log k) for best-k) per value.
+
+    Tracks the count, mean and variance (Welford's algorithm), the minimum and
+    maximum, the moving average over each window in `windows`, and the `best`
+    largest values in a min-heap. Every query is O(1) except best(), which
+    sorts the k kept values. The window and best-k sums are updated by adding
+    and subtracting values, so they are recomputed exactly with math.fsum
+    every `resum_every` values to keep rounding errors from accumulating; that
+    costs O(max(windows) + best) once per resum_every values.
+    """
+    def __init__(self, windows=(100,), best=100):
+        self.windows = tuple(windows)
+        self.best_size = best
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        # Ring of the most recent values, long enough for the largest window
+        self._recent = [0.0] * (max(self.windows) if self.windows else 0)
+        self._position = 0
+        self._window_sums = dict((window, 0.0) for window in self.windows)
+        self._best = []
+        self._best_sum = 0.0
+        self.resum_every = max(self.windows + (best, 1))
+
+    def push(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        for window in self.windows:
+            self._window_sums[window] += value
+            if self.count > window:
+                # The value leaving this window
+                self._window_sums[window] -= self._recent[(self._position - window) % len(self._recent)]
+        if self._recent:
+            self._recent[self._position] = value
+            self._position = (self._position + 1) % len(self._recent)
+
+        if self.best_size > 0:
+            if len(self._best) < self.best_size:
+                heapq.heappush(self._best, value)
+                self._best_sum += value
+            elif value > self._best[0]:
+                self._best_sum += value - heapq.heapreplace(self._best, value)
+
+        if self.count % self.resum_every == 0:
+            self._resum()
+
+    def _resum(self):
+        for window in self.windows:
+            n = min(window, self.count)
+            self._window_sums[window] = math.fsum(self._recent[(self._position - i - 1) % len(self._recent)] for i in range(n))
+        self._best_sum = math.fsum(self._best)
+
+    def variance(self):
+        """Population variance of every value pushed."""
+        return self._m2 / self.count if self.count else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+    def moving_average(self, window=None):
+        """Mean of the last `window` values, by default the first configured window."""
+        if window is None:
+            window = self.windows[0]
+        if window not in self._window_sums:
+            raise error.Error('No moving average over {} values: windows are {}'.format(window, self.windows))
+        n = min(window, self.count)
+        return self._window_sums[window] / n if n else 0.0
+
+    def best(self):
+        """The largest values pushed, at most `best` of them, in decreasing order."""
+        return sorted(self._best, reverse=True)
+
+    def best_mean(self):
+        return self._best_sum / len(self._best) if self._best else 0.0
+
+    def summary(self):
+        summary = {
+            'count': self.count,
+            'mean': self.mean,
+            'std': self.std(),
+            'min': self.min,
+            'max': self.max,
+            'best_mean': self.best_mean(),
+        }
+        for window in self.windows:
+            summary['moving_average_{}'.format(window)] = self.moving_average(window)
+        return summary
+
 class StatsRecorder(object):
-    def __init__(self, directory, file_prefix, autoreset=False, env_id=None):
+    """Records episode lengths, rewards, timestamps and types.
+
+    Completed episodes are kept in memory and appended to a JSON lines log on
+    flush, so each flush only writes the episodes completed since the previous
+    one. Use load_stats to read the log back and export_stats_json to produce
+    the single-document .stats.json format.
+
+    reward_stats and length_stats keep RunningStats over the completed
+    episodes, so summaries cost the same after any number of episodes.
+    """
+    def __init__(self, directory, file_prefix, autoreset=False, env_id=None, windows=(100,), best=100):
         self.autoreset = autoreset
         self.env_id = env_id
 
@@ -17,6 +134,9 @@ class StatsRecorder(object):
         self.episode_lengths = []
         self.episode_rewards = []
         self.episode_types = [] # experimental addition
+        self._completed_types = []
+        self.reward_stats = RunningStats(windows, best)
+        self.length_stats = RunningStats(windows, best)
         self._type = 't'
         self.timestamps = []
         self.steps = None
@@ -26,8 +146,10 @@ class StatsRecorder(object):
         self.done = None
         self.closed = False
 
-        filename = '{}.stats.json'.format(self.file_prefix)
+        filename = '{}{}'.format(self.file_prefix, LOG_EXTENSION)
         self.path = os.path.join(self.directory, filename)
+        self._flushed_episodes = 0
+        self._header_written = False
 
     @property
     def type(self):
@@ -84,6 +206,10 @@ class StatsRecorder(object):
             self.episode_lengths.append(self.steps)
             self.episode_rewards.append(float(self.rewards))
             self.timestamps.append(time.time())
+            # Types are recorded on reset, so the completed episode's is the last one
+            self._completed_types.append(self.episode_types[-1] if self.episode_types else self._type)
+            self.reward_stats.push(self.rewards)
+            self.length_stats.push(self.steps)
 
     def close(self):
         self.flush()
@@ -92,12 +218,123 @@ class StatsRecorder(object):
     def flush(self):
         if self.closed:
             return
+        self._write(self._take_pending())
+
+    def _take_pending(self):
+        """Returns the log lines not written yet and marks them as written."""
+        lines = []
+        if not self._header_written and self.initial_reset_timestamp is not None:
+            lines.append(json.dumps({'initial_reset_timestamp': self.initial_reset_timestamp}))
+            self._header_written = True
+        for i in range(self._flushed_episodes, len(self.timestamps)):
+            lines.append(json.dumps({
+                'timestamp': self.timestamps[i],
+                'episode_length': self.episode_lengths[i],
+                'episode_reward': self.episode_rewards[i],
+                'episode_type': self._completed_types[i],
+            }, default=json_encode_np))
+        self._flushed_episodes = len(self.timestamps)
+        return lines
+
+    def _write(self, lines, fsync=False):
+        # Touch the file even when there is nothing new, so the manifest never
+        # points to a missing log
+        with open(self.path, 'a') as f:
+            for line in lines:
+                f.write(line + '\n')
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+def read_stats(path):
+    """Opens a stats file (episode log or .stats.json) for streaming.
+
+    Returns (initial_reset_timestamp, episodes), where episodes iterates over
+    (timestamp, length, reward, type) tuples in the order they were recorded,
+    i.e. by increasing timestamp. Episode logs are read lazily, LOG_READ_LINES
+    lines at a time, and the file is only open while a block is read, so
+    merging many logs does not hold them all open. A truncated last line,
+    left by a crash in the middle of a flush, ends the iteration. type is None
+    for .stats.json files that predate episode types.
+    """
+    if not path.endswith(LOG_EXTENSION):
+        with open(path) as f:
+            content = json.load(f)
+        types = content.get('episode_types') or []
+        types = types + [None] * (len(content['timestamps']) - len(types))
+        episodes = zip(content['timestamps'], content['episode_lengths'], content['episode_rewards'], types)
+        return content['initial_reset_timestamp'], iter(episodes)
+
+    initial_reset_timestamp = None
+    offset = 0
+    # The header, when there is one, precedes the first episode
+    with open(path, 'rb') as f:
+        for line in iter(f.readline, b''):
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except ValueError:
+                return initial_reset_timestamp, iter(())
+            if 'initial_reset_timestamp' not in record:
+                break
+            if initial_reset_timestamp is None:
+                initial_reset_timestamp = record['initial_reset_timestamp']
+            offset = f.tell()
+    return initial_reset_timestamp, _read_log_episodes(path, offset)
+
+def _read_log_episodes(path, offset):
+    while True:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            lines = [f.readline() for _ in range(LOG_READ_LINES)]
+            offset = f.tell()
+        for line in lines:
+            if not line:
+                return
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except ValueError:
+                return
+            if 'timestamp' in record:
+                yield _episode(record)
+
+def _episode(record):
+    return record['timestamp'], record['episode_length'], record['episode_reward'], record['episode_type']
+
+def load_stats_log(path):
+    """Reads an episode log written by StatsRecorder.
+
+    Returns a dict with the keys of the .stats.json format.
+    """
+    initial_reset_timestamp, episodes = read_stats(path)
+    stats = {
+        'initial_reset_timestamp': initial_reset_timestamp,
+        'timestamps': [],
+        'episode_lengths': [],
+        'episode_rewards': [],
+        'episode_types': [],
+    }
+    for timestamp, length, reward, type in episodes:
+        stats['timestamps'].append(timestamp)
+        stats['episode_lengths'].append(length)
+        stats['episode_rewards'].append(reward)
+        stats['episode_types'].append(type)
+    return stats
+
+def load_stats(path):
+    """Reads either an episode log or a .stats.json file."""
+    if path.endswith(LOG_EXTENSION):
+        return load_stats_log(path)
+    with open(path) as f:
+        return json.load(f)
+
+def export_stats_json(path, json_path=None):
+    """Writes the episode log at `path` as a .stats.json file and returns its path.
 
-        with atomic_write.atomic_write(self.path) as f:
-            json.dump({
-                'initial_reset_timestamp': self.initial_reset_timestamp,
-                'timestamps': self.timestamps,
-                'episode_lengths': self.episode_lengths,
-                'episode_rewards': self.episode_rewards,
-                'episode_types': self.episode_types,
-            }, f, default=json_encode_np)
+    By default the .stats.json file is written next to the log.
+    """
+    if json_path is None:
+        json_path = path[:-len(LOG_EXTENSION)] + '.stats.json'
+    stats = load_stats_log(path)
+    with atomic_write.atomic_write(json_path) as f:
+        json.dump(stats, f, default=json_encode_np)
+    return json_path
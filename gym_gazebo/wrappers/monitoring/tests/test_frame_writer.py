@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+
+from gym_gazebo.wrappers.monitoring.video_recorder import FrameWriter, VideoRecorder
+
+class TextEnv(object):
+    metadata = {'render.modes': ['ansi']}
+
+    def __init__(self):
+        self.frames = 0
+
+    def render(self, mode=None):
+        self.frames += 1
+        return 'frame {}\nxx\n'.format(self.frames)
+
+class BlockedEncoder(object):
+    def __init__(self):
+        self.release = threading.Event()
+        self.frames = []
+        self.closed = False
+
+    def write_frame(self, frame):
+        self.release.wait()
+        self.frames.append(frame)
+
+    def close(self):
+        self.closed = True
+
+class FailingEncoder(object):
+    def write_frame(self, frame):
+        raise IOError('encoder died')
+
+    def close(self):
+        pass
+
+def test_text_frames_are_streamed():
+    env = TextEnv()
+    rec = VideoRecorder(env)
+    try:
+        for _ in range(3):
+            rec.capture_frame()
+        rec.close()
+        assert not rec.empty
+        assert not rec.broken
+        with open(rec.path) as f:
+            data = json.load(f)
+        assert len(data['stdout']) == 3
+        assert data['duration'] == 1.5
+        assert data['height'] == 3
+        assert data['width'] == 9
+        assert data['stdout'][2][1].endswith('frame 3\r\nxx\r\n')
+    finally:
+        os.remove(rec.path)
+        os.remove(rec.metadata_path)
+
+def test_drop_policy_counts_dropped_frames():
+    encoder = BlockedEncoder()
+    writer = FrameWriter(encoder, queue_size=2, overflow='drop')
+    for i in range(10):
+        writer.submit(i)
+    # The writer thread holds at most one frame, the queue two more
+    assert writer.dropped >= 7
+    encoder.release.set()
+    writer.close()
+    assert encoder.closed
+    assert writer.written + writer.dropped == writer.submitted == 10
+    assert encoder.frames == sorted(encoder.frames)
+
+def test_block_policy_keeps_every_frame():
+    encoder = BlockedEncoder()
+    encoder.release.set()
+    writer = FrameWriter(encoder, queue_size=1, overflow='block')
+    for i in range(50):
+        writer.submit(i)
+    writer.close()
+    assert writer.dropped == 0
+    assert encoder.frames == list(range(50))
+
+def test_encoder_errors_are_raised_on_close():
+    writer = FrameWriter(FailingEncoder(), queue_size=4)
+    writer.submit(0)
+    try:
+        writer.close()
+    except IOError:
+        pass
+    else:
+        assert False, 'The encoder error was not raised'
+
+def test_encoder_errors_mark_the_recording_broken():
+    env = TextEnv()
+    rec = VideoRecorder(env)
+    rec.capture_frame()
+    rec.writer.error = IOError('encoder died')
+    rec.capture_frame()
+    assert rec.broken
+    # Later frames are skipped instead of raising in the training loop
+    rec.capture_frame()
+    rec.close()
+    assert rec.metadata['broken']
+    assert not os.path.exists(rec.path)
+    os.remove(rec.metadata_path)
@@ -0,0 +1,39 @@
+import os
+
+from gym_gazebo.wrappers.monitoring import latency_recorder
+from gym_gazebo.wrappers.monitoring.tests import helpers
+
+def test_histogram_percentiles():
+    histogram = latency_recorder.LatencyHistogram()
+    for i in range(1, 101):
+        histogram.record(i * 1e-3)
+
+    assert histogram.count == 100
+    assert abs(histogram.mean() - 0.0505) < 1e-9
+    # Percentiles land on the upper edge of their bucket, about 12% wide
+    for q in (50, 90, 99):
+        exact = q * 1e-3
+        assert exact <= histogram.percentile(q) <= exact * 1.13
+    assert abs(histogram.percentile(100) - 0.1) < 1e-9
+
+def test_histogram_out_of_range():
+    histogram = latency_recorder.LatencyHistogram()
+    histogram.record(0.0)
+    histogram.record(1000.0)
+    assert histogram.counts[0] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.percentile(100) == 1000.0
+
+def test_recorder_round_trip():
+    with helpers.tempdir() as temp:
+        recorder = latency_recorder.LatencyRecorder(temp, 'openaigym.test')
+        recorder.record_step(0.02, {'image_wait': 0.015, 'process_image': 0.002})
+        recorder.record_step(0.03)
+        recorder.flush()
+
+        assert os.path.basename(recorder.path) == 'openaigym.test.latency.json'
+        histograms = latency_recorder.load_latency_file(recorder.path)
+        assert sorted(histograms) == ['image_wait', 'process_image', 'step']
+        assert histograms['step'].count == 2
+        assert histograms['image_wait'].counts == recorder.histograms['image_wait'].counts
+        assert recorder.summary()['step']['max'] == 0.03
@@ -0,0 +1,97 @@
+import json
+import os
+
+from gym_gazebo.wrappers.monitor import load_stats_columns
+from gym_gazebo.wrappers.monitoring import stats_index, stats_recorder
+from gym_gazebo.wrappers.monitoring.tests import helpers
+
+def append_episodes(path, timestamps, header=None):
+    with open(path, 'a') as f:
+        if header is not None:
+            f.write(json.dumps({'initial_reset_timestamp': header}) + '\n')
+        for t in timestamps:
+            f.write(json.dumps({'timestamp': t, 'episode_length': int(t), 'episode_reward': float(t), 'episode_type': 't'}) + '\n')
+
+def assert_same(indexed, streamed):
+    for column in ('timestamps', 'episode_lengths', 'episode_rewards', 'episode_types', 'data_sources'):
+        assert indexed[column].tolist() == streamed[column].tolist()
+    assert indexed['initial_reset_timestamps'] == streamed['initial_reset_timestamps']
+    assert indexed['initial_reset_timestamp'] == streamed['initial_reset_timestamp']
+
+def test_index_matches_streaming_merge():
+    with helpers.tempdir() as temp:
+        paths = [os.path.join(temp, name + stats_recorder.LOG_EXTENSION) for name in ('a', 'b')]
+        append_episodes(paths[0], [1, 4, 6], header=0)
+        append_episodes(paths[1], [2, 3], header=1)
+
+        index = stats_index.StatsIndex(temp)
+        assert_same(index.load(paths), load_stats_columns(paths))
+        assert os.path.exists(index.path)
+
+        # A fresh index object reads the cached columns back
+        assert_same(stats_index.StatsIndex(temp).load(paths), load_stats_columns(paths))
+
+def test_index_parses_only_appended_episodes():
+    with helpers.tempdir() as temp:
+        path = os.path.join(temp, 'a' + stats_recorder.LOG_EXTENSION)
+        append_episodes(path, [1, 2], header=0)
+        stats_index.StatsIndex(temp).load([path])
+
+        index = stats_index.StatsIndex(temp)
+        parsed = []
+        parse_log = index._parse_log
+        index._parse_log = lambda path, offset: parsed.append(offset) or parse_log(path, offset)
+
+        append_episodes(path, [3])
+        os.utime(path, (10, 10))
+        assert index.load([path])['timestamps'].tolist() == [1, 2, 3]
+        assert len(parsed) == 1 and parsed[0] > 0
+
+        # A partially written line is left for the next load
+        with open(path, 'a') as f:
+            f.write('{"timestamp": 4')
+        os.utime(path, (20, 20))
+        assert index.load([path])['timestamps'].tolist() == [1, 2, 3]
+
+def test_index_rebuilds_replaced_file():
+    with helpers.tempdir() as temp:
+        path = os.path.join(temp, 'a' + stats_recorder.LOG_EXTENSION)
+        append_episodes(path, [1, 2], header=0)
+        stats_index.StatsIndex(temp).load([path])
+
+        os.remove(path)
+        append_episodes(path, [5, 6, 7], header=4)
+        os.utime(path, (10, 10))
+        results = stats_index.StatsIndex(temp).load([path])
+        assert results['timestamps'].tolist() == [5, 6, 7]
+        assert results['initial_reset_timestamp'] == 4
+
+def test_index_window_and_columns():
+    with helpers.tempdir() as temp:
+        paths = [os.path.join(temp, name + stats_recorder.LOG_EXTENSION) for name in ('a', 'b')]
+        append_episodes(paths[0], [1, 4, 6], header=0)
+        append_episodes(paths[1], [2, 3, 7], header=1)
+
+        indexed = stats_index.StatsIndex(temp).load(paths, start=2, end=6, columns=['episode_lengths'])
+        assert indexed['episode_lengths'].tolist() == [2, 3, 4]
+        assert indexed['timestamps'] is None
+
+def test_index_and_streaming_agree_on_missing_types():
+    with helpers.tempdir() as temp:
+        log = os.path.join(temp, 'a' + stats_recorder.LOG_EXTENSION)
+        with open(log, 'w') as f:
+            f.write(json.dumps({'initial_reset_timestamp': 0}) + '\n')
+            for t, type in [(1, 't'), (2, None), (3, 'eval')]:
+                f.write(json.dumps({'timestamp': t, 'episode_length': 1, 'episode_reward': 1.0, 'episode_type': type}) + '\n')
+        # .stats.json files from before episode types were recorded have none
+        old = os.path.join(temp, 'b.stats.json')
+        with open(old, 'w') as f:
+            json.dump({'initial_reset_timestamp': 0, 'timestamps': [1.5, 2.5], 'episode_lengths': [1, 2], 'episode_rewards': [1.0, 2.0]}, f)
+
+        indexed = stats_index.StatsIndex(temp).load([log, old])
+        streamed = load_stats_columns([log, old])
+        assert_same(indexed, streamed)
+        assert streamed['episode_types'].tolist() == ['t', '', '', '', 'eval']
+
+        assert stats_index.StatsIndex(temp).load([old])['episode_types'] is None
+        assert load_stats_columns([old])['episode_types'] is None
@@ -0,0 +1,176 @@
+import json
+import os
+
+from gym_gazebo.wrappers.monitor import load_stats_columns, merge_stats_files
+from gym_gazebo.wrappers.monitoring import stats_recorder
+from gym_gazebo.wrappers.monitoring.tests import helpers
+
+def run_episodes(recorder, lengths, reward=1.0):
+    for length in lengths:
+        recorder.before_reset()
+        recorder.after_reset(None)
+        for step in range(length):
+            recorder.before_step(0)
+            recorder.after_step(None, reward, step == length - 1, {})
+
+def read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+def test_flush_appends_only_new_episodes():
+    with helpers.tempdir() as temp:
+        recorder = stats_recorder.StatsRecorder(temp, 'openaigym.test')
+        run_episodes(recorder, [3, 5])
+        recorder.flush()
+        first = read_lines(recorder.path)
+        assert len(first) == 3  # header and two episodes
+
+        recorder.flush()
+        assert read_lines(recorder.path) == first
+
+        run_episodes(recorder, [2])
+        recorder.flush()
+        lines = read_lines(recorder.path)
+        assert lines[:3] == first
+        assert len(lines) == 4
+
+def test_load_stats_log_round_trip():
+    with helpers.tempdir() as temp:
+        recorder = stats_recorder.StatsRecorder(temp, 'openaigym.test')
+        run_episodes(recorder, [3])
+        recorder.type = 'e'
+        run_episodes(recorder, [4], reward=2.0)
+        recorder.close()
+
+        stats = stats_recorder.load_stats_log(recorder.path)
+        assert stats['initial_reset_timestamp'] == recorder.initial_reset_timestamp
+        assert stats['timestamps'] == recorder.timestamps
+        assert stats['episode_lengths'] == [3, 4]
+        assert stats['episode_rewards'] == [3.0, 8.0]
+        assert stats['episode_types'] == ['t', 'e']
+
+def test_load_stats_log_ignores_truncated_line():
+    with helpers.tempdir() as temp:
+        recorder = stats_recorder.StatsRecorder(temp, 'openaigym.test')
+        run_episodes(recorder, [3, 4])
+        recorder.flush()
+        with open(recorder.path, 'a') as f:
+            f.write('{"timestamp": 12')
+
+        stats = stats_recorder.load_stats_log(recorder.path)
+        assert stats['episode_lengths'] == [3, 4]
+
+def test_export_stats_json():
+    with helpers.tempdir() as temp:
+        recorder = stats_recorder.StatsRecorder(temp, 'openaigym.test')
+        run_episodes(recorder, [3, 4])
+        recorder.close()
+
+        json_path = stats_recorder.export_stats_json(recorder.path)
+        assert json_path == os.path.join(temp, 'openaigym.test.stats.json')
+        with open(json_path) as f:
+            exported = json.load(f)
+        assert exported == stats_recorder.load_stats_log(recorder.path)
+
+def test_merge_reads_logs_and_json():
+    with helpers.tempdir() as temp:
+        log = stats_recorder.StatsRecorder(temp, 'openaigym.log')
+        run_episodes(log, [3, 4])
+        log.close()
+        exported = stats_recorder.StatsRecorder(temp, 'openaigym.exported')
+        run_episodes(exported, [5])
+        exported.close()
+        json_path = stats_recorder.export_stats_json(exported.path)
+
+        data_sources, _, timestamps, lengths, _, types, _ = merge_stats_files([log.path, json_path])
+        assert sorted(lengths) == [3, 4, 5]
+        assert timestamps == sorted(timestamps)
+        assert sorted(data_sources) == [0, 0, 1]
+        assert types == ['t', 't', 't']
+
+def write_log(directory, name, timestamps):
+    with open(os.path.join(directory, name + stats_recorder.LOG_EXTENSION), 'w') as f:
+        f.write(json.dumps({'initial_reset_timestamp': timestamps[0] - 1}) + '\n')
+        for t in timestamps:
+            f.write(json.dumps({'timestamp': t, 'episode_length': int(t), 'episode_reward': float(t), 'episode_type': 't'}) + '\n')
+    return os.path.join(directory, name + stats_recorder.LOG_EXTENSION)
+
+def test_load_stats_columns_merges_by_time():
+    with helpers.tempdir() as temp:
+        paths = [write_log(temp, 'a', [1, 4, 6]), write_log(temp, 'b', [2, 3, 7]), write_log(temp, 'c', [5])]
+        results = load_stats_columns(paths)
+        assert results['timestamps'].tolist() == [1, 2, 3, 4, 5, 6, 7]
+        assert results['episode_lengths'].tolist() == [1, 2, 3, 4, 5, 6, 7]
+        assert results['data_sources'].tolist() == [0, 1, 1, 0, 2, 0, 1]
+        assert results['initial_reset_timestamps'] == [0, 1, 4]
+        assert results['initial_reset_timestamp'] == 0
+
+def test_load_stats_columns_window_and_columns():
+    with helpers.tempdir() as temp:
+        paths = [write_log(temp, 'a', [1, 4, 6]), write_log(temp, 'b', [2, 3, 7]), write_log(temp, 'c', [5])]
+        results = load_stats_columns(paths, start=3, end=6, columns=['episode_rewards'])
+        assert results['episode_rewards'].tolist() == [3.0, 4.0, 5.0]
+        assert results['timestamps'] is None
+        assert results['episode_types'] is None
+
+        results = load_stats_columns(paths, start=100)
+        assert len(results['timestamps']) == 0
+        assert results['initial_reset_timestamps'] == []
+
+def test_load_stats_columns_skips_unrequested_columns():
+    with helpers.tempdir() as temp:
+        path = os.path.join(temp, 'a' + stats_recorder.LOG_EXTENSION)
+        with open(path, 'w') as f:
+            # Lengths no integer column could hold show that column is never accumulated
+            f.write(json.dumps({'timestamp': 1, 'episode_length': 'unknown', 'episode_reward': 2.0, 'episode_type': 't'}) + '\n')
+        results = load_stats_columns([path], columns=['episode_rewards', 'episode_types'])
+        assert results['episode_rewards'].tolist() == [2.0]
+        assert results['episode_types'].dtype.kind == 'U'
+        assert results['episode_lengths'] is None
+
+        try:
+            load_stats_columns([path], columns=['episode_lengths'])
+        except TypeError:
+            pass
+        else:
+            assert False, 'Expected the lengths column to be accumulated'
+
+def test_read_stats_streams_logs_in_blocks():
+    with helpers.tempdir() as temp:
+        timestamps = list(range(1, 2 * stats_recorder.LOG_READ_LINES + 10))
+        path = write_log(temp, 'a', timestamps)
+        initial_reset_timestamp, episodes = stats_recorder.read_stats(path)
+        assert initial_reset_timestamp == 0
+        assert [episode[0] for episode in episodes] == timestamps
+
+def test_running_stats():
+    values = [3.0, -1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0]
+    stats = stats_recorder.RunningStats(windows=(3, 5), best=3)
+    for value in values:
+        stats.push(value)
+
+    mean = sum(values) / len(values)
+    assert stats.count == len(values)
+    assert abs(stats.mean - mean) < 1e-12
+    assert abs(stats.variance() - sum((v - mean) ** 2 for v in values) / len(values)) < 1e-12
+    assert stats.min == -1.0 and stats.max == 9.0
+    assert abs(stats.moving_average(3) - sum(values[-3:]) / 3) < 1e-12
+    assert abs(stats.moving_average(5) - sum(values[-5:]) / 5) < 1e-12
+    assert stats.best() == [9.0, 6.0, 5.0]
+    assert stats.best_mean() == 20.0 / 3
+
+def test_running_stats_sums_do_not_drift():
+    stats = stats_recorder.RunningStats(windows=(3,), best=1)
+    # Adding then subtracting 1e20 loses the small values summed in between
+    for value in [1e20, 1.0, 1.0, 1.0, 1.0, 1.0]:
+        stats.push(value)
+    assert stats.moving_average(3) == 1.0
+
+def test_recorder_aggregates_episodes():
+    with helpers.tempdir() as temp:
+        recorder = stats_recorder.StatsRecorder(temp, 'openaigym.test', windows=(2,), best=2)
+        run_episodes(recorder, [3, 5, 4])
+        assert recorder.length_stats.count == 3
+        assert recorder.length_stats.moving_average() == 4.5
+        assert recorder.length_stats.best_mean() == 4.5
+        assert recorder.reward_stats.max == 5.0
@@ -4,8 +4,10 @@ import subprocess
 import tempfile
 import os.path
 import distutils.spawn, distutils.version
+import threading
 import numpy as np
 from six import StringIO
+from six.moves import queue
 import six
 from gym import error, logger
 
@@ -27,12 +29,21 @@ class VideoRecorder(object):
         base_path (Optional[str]): Alternatively, path to the video file without extension, which will be added.
         metadata (Optional[dict]): Contents to save to the metadata file.
         enabled (bool): Whether to actually record video, or just no-op (for convenience)
+        queue_size (int): Frames that may wait for the encoder thread.
+        overflow (str): What capture_frame does when the queue is full: 'block' until the encoder catches up, or 'drop' the frame.
+
+    Frames are checked on the calling thread, then handed to a FrameWriter
+    thread that feeds the encoder, so a slow encoder only costs the caller
+    the copy of the frame (and, with overflow='block', waiting for a free slot).
     """
 
-    def __init__(self, env, path=None, metadata=None, enabled=True, base_path=None):
+    def __init__(self, env, path=None, metadata=None, enabled=True, base_path=None, queue_size=16, overflow='block'):
         modes = env.metadata.get('render.modes', [])
         self._async = env.metadata.get('semantics.async')
         self.enabled = enabled
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.writer = None
 
         # Don't bother setting anything else if not enabled
         if not self.enabled:
@@ -50,6 +61,8 @@ class VideoRecorder(object):
 
         if path is not None and base_path is not None:
             raise error.Error("You can pass at most one of `path` or `base_path`.")
+        if overflow not in FrameWriter.policies:
+            raise error.Error("Invalid overflow policy {}: must be one of {}".format(overflow, ', '.join(FrameWriter.policies)))
 
         self.last_frame = None
         self.env = env
@@ -92,6 +105,10 @@ class VideoRecorder(object):
     def functional(self):
         return self.enabled and not self.broken
 
+    @property
+    def frames_dropped(self):
+        return self.writer.dropped if self.writer else 0
+
     def capture_frame(self):
         """Render the given `env` and add the resulting frame to the video."""
         if not self.functional: return
@@ -122,7 +139,14 @@ class VideoRecorder(object):
 
         if self.encoder:
             logger.debug('Closing video encoder: path=%s', self.path)
-            self.encoder.close()
+            try:
+                self.writer.close()
+            except Exception as e:
+                logger.warn('Video encoder failed, marking as broken: %s', e)
+                self.broken = True
+            if self.writer.dropped:
+                logger.info('Dropped %d of %d video frames because the encoder fell behind: path=%s', self.writer.dropped, self.writer.submitted, self.path)
+                self.metadata['frames_dropped'] = self.writer.dropped
             self.encoder = None
         else:
             # No frames captured. Set metadata, and remove the empty output file.
@@ -150,37 +174,117 @@ class VideoRecorder(object):
         with open(self.metadata_path, 'w') as f:
             json.dump(self.metadata, f)
 
+    def _start_encoder(self, encoder):
+        self.encoder = encoder
+        self.metadata['encoder_version'] = self.encoder.version_info
+        self.writer = FrameWriter(encoder, self.queue_size, self.overflow)
+
     def _encode_ansi_frame(self, frame):
         if not self.encoder:
-            self.encoder = TextEncoder(self.path, self.frames_per_sec)
-            self.metadata['encoder_version'] = self.encoder.version_info
-        self.encoder.capture_frame(frame)
-        self.empty = False
+            self._start_encoder(TextEncoder(self.path, self.frames_per_sec))
+        self._submit(self.encoder.check_frame(frame))
 
     def _encode_image_frame(self, frame):
         if not self.encoder:
-            self.encoder = ImageEncoder(self.path, frame.shape, self.frames_per_sec)
-            self.metadata['encoder_version'] = self.encoder.version_info
+            self._start_encoder(ImageEncoder(self.path, frame.shape, self.frames_per_sec))
 
         try:
-            self.encoder.capture_frame(frame)
+            payload = self.encoder.check_frame(frame)
         except error.InvalidFrame as e:
             logger.warn('Tried to pass invalid video frame, marking as broken: %s', e)
             self.broken = True
+        else:
+            self._submit(payload)
+
+    def _submit(self, payload):
+        try:
+            self.writer.submit(payload)
+        except Exception as e:
+            # The writer thread hit an encoder error; stop recording rather than failing the env step
+            logger.warn('Video encoder failed, marking as broken: %s', e)
+            self.broken = True
         else:
             self.empty = False
 
 
+class FrameWriter(object):
+    """Feeds checked frames to an encoder from a background thread.
+
+    At most queue_size frames wait in the queue. When it is full, submit
+    either blocks ('block') or discards the frame ('drop'); dropped frames
+    are counted in `dropped`. An error raised by the encoder stops the
+    writer and is re-raised by the next submit or by close.
+    """
+    policies = ('block', 'drop')
+
+    def __init__(self, encoder, queue_size=16, overflow='block'):
+        self.encoder = encoder
+        self.overflow = overflow
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+        self._queue = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._run, name='VideoWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, payload):
+        if self.error is not None:
+            raise self.error
+        self.submitted += 1
+        if self.overflow == 'drop':
+            try:
+                self._queue.put_nowait(payload)
+            except queue.Full:
+                self.dropped += 1
+        else:
+            self._queue.put(payload)
+
+    def close(self):
+        """Writes the queued frames, then closes the encoder."""
+        self._queue.put(None)
+        self._thread.join()
+        self.encoder.close()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        while True:
+            payload = self._queue.get()
+            if payload is None:
+                return
+            if self.error is not None:
+                # Keep draining so a blocked submit can return
+                continue
+            try:
+                self.encoder.write_frame(payload)
+                self.written += 1
+            except Exception as e:
+                self.error = e
+
+
 class TextEncoder(object):
     """Store a moving picture made out of ANSI frames. Format adapted from
-    https://github.com/asciinema/asciinema/blob/master/doc/asciicast-v1.md"""
+    https://github.com/asciinema/asciinema/blob/master/doc/asciicast-v1.md
+
+    Events are appended to the output file as frames arrive, so memory use
+    does not grow with the episode; the size and duration, which depend on
+    every frame, are written at close."""
 
     def __init__(self, output_path, frames_per_sec):
         self.output_path = output_path
         self.frames_per_sec = frames_per_sec
-        self.frames = []
-
-    def capture_frame(self, frame):
+        #self.frame_duration = float(1) / self.frames_per_sec
+        self.frame_duration = .5
+        self.frame_count = 0
+        self.height = 0
+        self.width = 0
+        self.file = open(self.output_path, 'w')
+        self.file.write('{"version": 1, "command": "-", "title": "gym VideoRecorder episode", "env": {}, "stdout": [')
+
+    def check_frame(self, frame):
+        """Validates a frame and returns its UTF-8 bytes."""
         string = None
         if isinstance(frame, str):
             string = frame
@@ -197,37 +301,32 @@ class TextEncoder(object):
         if six.b('\r') in frame_bytes:
             raise error.InvalidFrame('Frame contains carriage returns (only newlines are allowed: """{}"""'.format(string))
 
-        self.frames.append(frame_bytes)
-
-    def close(self):
-        #frame_duration = float(1) / self.frames_per_sec
-        frame_duration = .5
+        return frame_bytes
 
+    def write_frame(self, frame_bytes):
         # Turn frames into events: clear screen beforehand
         # https://rosettacode.org/wiki/Terminal_control/Clear_the_screen#Python
         # https://rosettacode.org/wiki/Terminal_control/Cursor_positioning#Python
         clear_code = six.b("%c[2J\033[1;1H" % (27))
         # Decode the bytes as UTF-8 since JSON may only contain UTF-8
-        events = [ (frame_duration, (clear_code+frame.replace(six.b('\n'),six.b('\r\n'))).decode('utf-8'))  for frame in self.frames ]
+        event = (self.frame_duration, (clear_code+frame_bytes.replace(six.b('\n'),six.b('\r\n'))).decode('utf-8'))
+        if self.frame_count:
+            self.file.write(', ')
+        json.dump(event, self.file)
+        self.frame_count += 1
 
         # Calculate frame size from the largest frames.
         # Add some padding since we'll get cut off otherwise.
-        height = max([frame.count(six.b('\n')) for frame in self.frames]) + 1
-        width = max([max([len(line) for line in frame.split(six.b('\n'))]) for frame in self.frames]) + 2
-
-        data = {
-            "version": 1,
-            "width": width,
-            "height": height,
-            "duration": len(self.frames)*frame_duration,
-            "command": "-",
-            "title": "gym VideoRecorder episode",
-            "env": {}, # could add some env metadata here
-            "stdout": events,
-        }
+        self.height = max(self.height, frame_bytes.count(six.b('\n')) + 1)
+        self.width = max(self.width, max([len(line) for line in frame_bytes.split(six.b('\n'))]) + 2)
+
+    def capture_frame(self, frame):
+        self.write_frame(self.check_frame(frame))
 
-        with open(self.output_path, 'w') as f:
-            json.dump(data, f)
+    def close(self):
+        self.file.write('], "width": {}, "height": {}, "duration": {}}}'.format(
+            self.width, self.height, json.dumps(self.frame_count*self.frame_duration)))
+        self.file.close()
 
     @property
     def version_info(self):
@@ -289,14 +388,21 @@ class ImageEncoder(object):
         else:
             self.proc = subprocess.Popen(self.cmdline, stdin=subprocess.PIPE)
 
-    def capture_frame(self, frame):
+    def check_frame(self, frame):
+        """Validates a frame and returns a copy the caller may not modify."""
         if not isinstance(frame, (np.ndarray, np.generic)):
             raise error.InvalidFrame('Wrong type {} for {} (must be np.ndarray or np.generic)'.format(type(frame), frame))
         if frame.shape != self.frame_shape:
             raise error.InvalidFrame("Your frame has shape {}, but the VideoRecorder is configured for shape {}.".format(frame.shape, self.frame_shape))
         if frame.dtype != np.uint8:
             raise error.InvalidFrame("Your frame has data type {}, but we require uint8 (i.e. RGB values from 0-255).".format(frame.dtype))
+        # Envs may reuse their frame buffer before the writer thread gets to it
+        return np.array(frame, copy=True)
+
+    def capture_frame(self, frame):
+        self.write_frame(self.check_frame(frame))
 
+    def write_frame(self, frame):
         if distutils.version.LooseVersion(np.__version__) >= distutils.version.LooseVersion('1.9.0'):
             self.proc.stdin.write(frame.tobytes())
         else:
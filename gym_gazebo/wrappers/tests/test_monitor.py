@@ -0,0 +1,89 @@
+import os
+import threading
+
+import gym
+from gym_gazebo import wrappers
+from gym_gazebo.wrappers.monitor import load_results
+from gym_gazebo.wrappers.monitoring import stats_recorder
+from gym_gazebo.wrappers.monitoring.tests import helpers
+
+def run_episodes(env, episodes):
+    for _ in range(episodes):
+        env.reset()
+        done = False
+        while not done:
+            _, _, done, _ = env.step(env.action_space.sample())
+
+def test_monitor_writes_on_close():
+    with helpers.tempdir() as temp:
+        env = wrappers.Monitor(gym.make('CartPole-v0'), temp, video_callable=False)
+        run_episodes(env, 3)
+        path = env.stats_recorder.path
+        assert not os.path.exists(path)
+
+        env.close()
+        results = load_results(temp)
+        assert results['episode_lengths'] == env.get_episode_lengths()
+
+def test_flush_every_episodes():
+    with helpers.tempdir() as temp:
+        env = wrappers.Monitor(gym.make('CartPole-v0'), temp, video_callable=False, flush_every_episodes=2)
+        run_episodes(env, 3)
+        # The third reset flushed the two completed episodes
+        env._writer.barrier()
+        assert len(stats_recorder.load_stats_log(env.stats_recorder.path)['timestamps']) == 2
+        env.close()
+
+def test_forced_flush_is_a_barrier():
+    with helpers.tempdir() as temp:
+        env = wrappers.Monitor(gym.make('CartPole-v0'), temp, video_callable=False)
+        run_episodes(env, 2)
+        env._flush(force=True)
+        stats = stats_recorder.load_stats_log(env.stats_recorder.path)
+        assert stats['episode_lengths'] == env.get_episode_lengths()
+        env.close()
+
+def test_load_results_while_flushes_are_queued():
+    with helpers.tempdir() as temp:
+        env = wrappers.Monitor(gym.make('CartPole-v0'), temp, video_callable=False, write_upon_reset=True)
+        run_episodes(env, 2)
+        env._flush(force=True)
+        [manifest] = [f for f in os.listdir(temp) if f.endswith('.manifest.json')]
+
+        # Hold the writer thread halfway through a manifest write
+        release = threading.Event()
+        def half_written_manifest():
+            with open(os.path.join(temp, manifest + '~'), 'w') as f:
+                f.write('{"stats": ')
+            release.wait()
+        env._writer.submit(half_written_manifest)
+        run_episodes(env, 2)
+
+        try:
+            results = load_results(temp)
+            assert results['manifests'] == [os.path.join(temp, manifest)]
+            assert len(results['episode_lengths']) >= 2
+        finally:
+            release.set()
+        env.close()
+        assert load_results(temp)['episode_lengths'] == env.get_episode_lengths()
+
+class PhaseTimings(gym.Wrapper):
+    def step(self, action):
+        observation, reward, done, info = self.env.step(action)
+        info = dict(info, phase_timings={'physics': 0.001})
+        return observation, reward, done, info
+
+    def reset(self, **kwargs):
+        return self.env.reset(**kwargs)
+
+def test_monitor_records_latencies():
+    with helpers.tempdir() as temp:
+        env = wrappers.Monitor(PhaseTimings(gym.make('CartPole-v0')), temp, video_callable=False)
+        run_episodes(env, 2)
+        env.close()
+
+        summary = env.get_latency_summary()
+        assert summary['step']['count'] == env.get_total_steps()
+        assert summary['physics']['count'] == env.get_total_steps()
+        assert os.path.exists(env.latency_recorder.path)